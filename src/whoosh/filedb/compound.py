@@ -37,20 +37,12 @@ try:
 except ImportError:
     mmap = None
 
-from whoosh.filedb.filestore import FileStorage, StorageError
+from whoosh.filedb.filestore import FileStorage, Storage, StorageError
 from whoosh.filedb.structfile import BufferFile, StructFile
 from whoosh.system import emptybytes
 from whoosh.util import random_name
 
 
-def memoryview_(source, offset=None, length=None):
-    mv = memoryview(source)
-    if offset or length:
-        return mv[offset : offset + length]
-    else:
-        return mv
-
-
 class CompoundStorage(FileStorage):
     readonly = True
 
@@ -70,6 +62,8 @@ class CompoundStorage(FileStorage):
         self._options = self._file.read_pickle()
         self._locks = {}
         self._source = None
+        # A view of the whole map, which opening a file just slices
+        self._view = None
 
         use_mmap = (
             use_mmap
@@ -94,6 +88,7 @@ class CompoundStorage(FileStorage):
                 # If that worked, we can close the file handle we were given
                 self._file.close()
                 self._file = None
+                self._view = memoryview(self._source)
 
     def __repr__(self):
         return f"<{self.__class__.__name__} ({self._name})>"
@@ -103,6 +98,10 @@ class CompoundStorage(FileStorage):
             raise Exception("Already closed")
         self.is_closed = True
 
+        if self._view is not None:
+            # Views of the files opened from it stay valid until they're
+            # released themselves
+            self._view.release()
         if self._source:
             try:
                 self._source.close()
@@ -111,6 +110,10 @@ class CompoundStorage(FileStorage):
         if self._file:
             self._file.close()
 
+    def index_exists(self, indexname=None):
+        # The files are in the compound file, not a directory
+        return Storage.index_exists(self, indexname)
+
     def range(self, name):
         try:
             fileinfo = self._dir[name]
@@ -123,9 +126,11 @@ class CompoundStorage(FileStorage):
             raise StorageError("Storage was closed")
 
         offset, length = self.range(name)
-        if self._source:
-            # Create a memoryview/buffer from the mmap
-            buf = memoryview_(self._source, offset, length)
+        if self._view is not None:
+            # Slice the view of the map directly instead of going through
+            # memoryview_(), which would make a new view of the whole map for
+            # every file opened
+            buf = self._view[offset : offset + length]
             f = BufferFile(buf, name=name)
         elif hasattr(self._file, "subset"):
             f = self._file.subset(offset, length, name=name)
@@ -133,6 +138,18 @@ class CompoundStorage(FileStorage):
             f = StructFile(SubFile(self._file, offset, length), name=name)
         return f
 
+    def open_buffer(self, name):
+        if self.is_closed:
+            raise StorageError("Storage was closed")
+
+        offset, length = self.range(name)
+        if self._view is not None:
+            return self._view[offset : offset + length].toreadonly()
+        return memoryview(self._file.get(offset, length))
+
+    def __iter__(self):
+        return iter(self.list())
+
     def list(self):
         return list(self._dir.keys())
 
@@ -147,10 +164,22 @@ class CompoundStorage(FileStorage):
         info = self._dir[name]
         return info["modified"]
 
+    def file_stats(self, names=None):
+        directory = self._dir
+        if names is None:
+            names = directory
+        return {
+            name: (directory[name]["length"], directory[name].get("modified"))
+            for name in names
+        }
+
     def lock(self, name):
-        if name not in self._locks:
-            self._locks[name] = Lock()
-        return self._locks[name]
+        # setdefault() is atomic, so two threads asking for a new name at the
+        # same time get the same lock
+        try:
+            return self._locks[name]
+        except KeyError:
+            return self._locks.setdefault(name, Lock())
 
     @staticmethod
     def assemble(dbfile, store, names, **options):
@@ -166,12 +195,20 @@ class CompoundStorage(FileStorage):
             if name.endswith(".toc") or name.endswith(".seg"):
                 raise Exception(name)
 
+        # Get each file's size and time together
+        stats = store.file_stats(names)
+        # Each file is read from start to end, so let the OS read ahead. Only
+        # pass the hint to FileStorage, in case another storage implementation
+        # passes unknown keyword arguments on to its file objects
+        if isinstance(store, FileStorage):
+            openargs = {"hint": "sequential"}
+        else:
+            openargs = {}
         for name in names:
             offset = dbfile.tell()
-            length = store.file_length(name)
-            modified = store.file_modified(name)
+            length, modified = stats[name]
             directory[name] = {"offset": offset, "length": length, "modified": modified}
-            f = store.open_file(name)
+            f = store.open_file(name, **openargs)
             copyfileobj(f, dbfile)
             f.close()
 
@@ -317,12 +354,22 @@ class CompoundWriter:
             return sum(b[2] for b in self.blocks) + self._buffer.tell()
 
         def write(self, inbytes):
+            # Accepts any bytes-like object. Its size is taken in bytes,
+            # since len() counts items for a memoryview of a typed array
             bio = self._buffer
             buflen = bio.tell()
-            length = buflen + len(inbytes)
+            if type(inbytes) is bytes:
+                inlen = len(inbytes)
+            else:
+                inlen = memoryview(inbytes).nbytes
+            length = buflen + inlen
             if length >= self._buffersize:
                 offset = self._dbfile.tell()
-                self._dbfile.write(bio.getvalue()[:buflen])
+                if buflen:
+                    # Write the buffered bytes from a view of the buffer
+                    # instead of copying them out with getvalue()
+                    with bio.getbuffer() as buffered:
+                        self._dbfile.write(buffered[:buflen])
                 self._dbfile.write(inbytes)
 
                 self.blocks.append((None, offset, length))
@@ -70,6 +70,9 @@ class FileIndex(SegmentDeletionMixin, Index):
     def __init__(self, storage, schema, create=False, indexname=_DEF_INDEX_NAME):
         self.storage = storage
         self.indexname = indexname
+        self._toc_filename_gen = None
+        self._toc_filename_cache = None
+        self._toc_sig = None
 
         if schema is not None and not isinstance(schema, Schema):
             raise ValueError(f"{schema!r} is not a Schema object")
@@ -125,9 +128,14 @@ class FileIndex(SegmentDeletionMixin, Index):
 
     def latest_generation(self):
         pattern = _toc_pattern(self.indexname)
+        prefix = f"_{self.indexname}_"
 
         max = -1
         for filename in self.storage:
+            # Cheap prefix check before running the regex, since most files
+            # in the storage won't belong to this index
+            if not filename.startswith(prefix):
+                continue
             m = pattern.match(filename)
             if m:
                 num = int(m.group(1))
@@ -136,10 +144,11 @@ class FileIndex(SegmentDeletionMixin, Index):
         return max
 
     def refresh(self):
-        if not self.up_to_date():
-            return self.__class__(self.storage, self.schema, indexname=self.indexname)
-        else:
+        if self.up_to_date() and self._toc_signature() == self._toc_sig:
+            # Nothing has changed since the TOC was read, so don't bother
+            # unpickling the segments again
             return self
+        return self.__class__(self.storage, self.schema, indexname=self.indexname)
 
     def up_to_date(self):
         return self.generation == self.latest_generation()
@@ -170,6 +179,7 @@ class FileIndex(SegmentDeletionMixin, Index):
 
         # Rename temporary file to the proper filename
         self.storage.rename_file(tempfilename, self._toc_filename(), safe=True)
+        self._toc_sig = self._toc_signature()
 
     def _read(self, schema):
         # Reads the content of this index from the .toc file.
@@ -202,10 +212,27 @@ class FileIndex(SegmentDeletionMixin, Index):
             self.schema = pickle.loads(stream.read_string())
 
         generation = stream.read_int()
-        assert generation == self.generation
+        if generation != self.generation:
+            raise IndexError(
+                "TOC file %r contains generation %s, expected %s"
+                % (self._toc_filename(), generation, self.generation)
+            )
         self.segment_counter = stream.read_int()
         self.segments = stream.read_pickle()
         stream.close()
+        self._toc_sig = self._toc_signature()
+
+    def _toc_signature(self):
+        # Returns the (length, modified time) of this generation's TOC file,
+        # used by refresh() as a cheap check for whether it has been rewritten
+        # (for example when the index is re-created at generation 0). Both
+        # come from one file_stats() call, which is a single stat() on disk
+        tocfilename = self._toc_filename()
+        try:
+            return self.storage.file_stats([tocfilename])[tocfilename]
+        except (OSError, NameError):
+            # RamStorage raises NameError for a missing file
+            return None
 
     def _next_segment_name(self):
         # Returns the name of the next segment in sequence.
@@ -223,8 +250,13 @@ class FileIndex(SegmentDeletionMixin, Index):
 
     def _toc_filename(self):
         # Returns the computed filename of the TOC for this index name and
-        # generation.
-        return f"_{self.indexname}_{self.generation}.toc"
+        # generation. The name only changes when the generation does, so
+        # cache it instead of re-formatting it on every up_to_date() poll.
+        gen = self.generation
+        if gen != self._toc_filename_gen:
+            self._toc_filename_cache = f"_{self.indexname}_{gen}.toc"
+            self._toc_filename_gen = gen
+        return self._toc_filename_cache
 
     def last_modified(self):
         return self.storage.file_modified(self._toc_filename())
@@ -261,6 +293,9 @@ class FileIndex(SegmentDeletionMixin, Index):
 
         self.generation += 1
         self._write()
+        # Clean up while the writer still holds the lock: once it's released,
+        # the next writer may start creating files for a new segment, which
+        # this would take for unused files
         self._clean_files()
 
         self._acquire_readlocks()
@@ -272,17 +307,21 @@ class FileIndex(SegmentDeletionMixin, Index):
         # probably be deleted eventually by a later call to clean_files.
 
         storage = self.storage
+        generation = self.generation
         current_segment_names = {s.name for s in self.segments}
 
         tocpattern = _toc_pattern(self.indexname)
         segpattern = _segment_pattern(self.indexname)
+        prefix = f"_{self.indexname}_"
 
         todelete = set()
         for filename in storage:
+            if not filename.startswith(prefix):
+                continue
             tocm = tocpattern.match(filename)
             segm = segpattern.match(filename)
             if tocm:
-                if int(tocm.group(1)) != self.generation:
+                if int(tocm.group(1)) != generation:
                     todelete.add(filename)
             elif segm:
                 name = segm.group(1)
@@ -438,15 +477,17 @@ class SegmentSet:
         return segment.is_deleted(segdocnum)
 
     def reader(self, storage, schema):
-        from whoosh.filedb.filereading import SegmentReader
+        from whoosh.filedb.filereading import get_segment_reader
 
         segments = self.segments
         if len(segments) == 1:
-            return SegmentReader(storage, segments[0], schema)
+            return get_segment_reader(storage, segments[0], schema)
         else:
             from whoosh.reading import MultiReader
 
-            readers = [SegmentReader(storage, segment, schema) for segment in segments]
+            readers = [
+                get_segment_reader(storage, segment, schema) for segment in segments
+            ]
             return MultiReader(readers, schema)
 
 
@@ -601,7 +642,7 @@ def _toc_pattern(indexname):
     name is the name of the index.
     """
 
-    return re.compile(f"_{indexname}_([0-9]+).toc")
+    return re.compile(f"_{indexname}_([0-9]+).toc", re.ASCII)
 
 
 def _segment_pattern(indexname):
@@ -609,4 +650,6 @@ def _segment_pattern(indexname):
     name is the name of the index.
     """
 
-    return re.compile(f"(_{indexname}_[0-9]+).({Segment.EXTENSIONS.values()})")
+    return re.compile(
+        f"(_{indexname}_[0-9]+).({Segment.EXTENSIONS.values()})", re.ASCII
+    )
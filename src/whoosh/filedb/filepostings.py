@@ -14,15 +14,52 @@
 # limitations under the License.
 # ===============================================================================
 
-import types
 from array import array
+from bisect import bisect_left
+from copy import copy
+from itertools import islice
+from operator import truediv
 from struct import Struct
+from types import MethodType
 
 from whoosh.matching import Matcher, ReadTooFar
-from whoosh.support import unicode
-from whoosh.system import _FLOAT_SIZE, _INT_SIZE
-from whoosh.util import byte_to_length, length_to_byte, utf8decode, utf8encode
-from whoosh.writing import PostingWriter
+from whoosh.system import _FLOAT_SIZE, _INT_SIZE, IS_LITTLE
+from whoosh.util.numeric import _BYTE_LENGTHS, length_to_byte
+from whoosh.util.text import utf8decode, utf8encode
+from whoosh.util.varints import varint
+
+# Precompiled struct for the unsigned ints in the postings file (block counts,
+# block pointers and integer max IDs)
+_UINT = Struct("!I")
+_UINT_ZERO = _UINT.pack(0)
+
+# Block flags, stored in the (previously unused) second field of the header
+# Integer IDs are stored as varint-encoded gaps instead of an array of uints
+_DELTA_IDS = 1
+
+
+def _array_bytes(arry):
+    # Returns the contents of the array in the big-endian order written by
+    # StructFile.write_array()
+    if IS_LITTLE:
+        arry = copy(arry)
+        arry.byteswap()
+    return arry.tobytes()
+
+
+def _varint_at(buf, pos):
+    # Decodes the varint at the given position in a buffer, returning the
+    # value and the position after it
+    b = buf[pos]
+    pos += 1
+    value = b & 0x7F
+    shift = 7
+    while b & 0x80:
+        b = buf[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        shift += 7
+    return value, pos
 
 
 class BlockInfo:
@@ -34,10 +71,17 @@ class BlockInfo:
         "minlength",
         "maxid",
         "dataoffset",
+        "flags",
     )
 
-    # nextblockoffset, unused, postcount, maxweight, maxwol, unused, minlength
-    _struct = Struct("!IiiBfffB")
+    # nextblockoffset, flags, postcount, maxweight, maxwol, unused, minlength
+    _struct = Struct("!IiifffB")
+    # Just the leading nextblockoffset, flags, postcount fields
+    _head_struct = Struct("!Iii")
+
+    # Pre-bound versions of the struct attributes used for every block read
+    _UNPACK = _struct.unpack_from
+    _SIZE = _struct.size
 
     def __init__(
         self,
@@ -48,6 +92,7 @@ class BlockInfo:
         minlength=None,
         maxid=None,
         dataoffset=None,
+        flags=0,
     ):
         self.nextoffset = nextoffset
         self.postcount = postcount
@@ -56,6 +101,7 @@ class BlockInfo:
         self.minlength = minlength
         self.maxid = maxid
         self.dataoffset = dataoffset
+        self.flags = flags
 
     def __repr__(self):
         return (
@@ -74,60 +120,109 @@ class BlockInfo:
             )
         )
 
-    def to_file(self, file):
-        file.write(
-            self._struct.pack(
-                self.nextoffset,
-                0,
-                self.postcount,
-                self.maxweight,
-                self.maxwol,
-                0,
-                length_to_byte(self.minlength),
-            )
+    def to_bytes(self):
+        header = self._struct.pack(
+            self.nextoffset,
+            self.flags,
+            self.postcount,
+            self.maxweight,
+            self.maxwol,
+            0,
+            length_to_byte(self.minlength),
         )
 
         maxid = self.maxid
-        if isinstance(maxid, unicode):
-            file.write_string(utf8encode(maxid)[0])
+        if isinstance(maxid, str):
+            encoded = utf8encode(maxid)[0]
+            return header + varint(len(encoded)) + encoded
         else:
-            file.write_uint(maxid)
+            return header + _UINT.pack(maxid)
+
+    def to_file(self, file):
+        file.write(self.to_bytes())
 
     def _read_id(self, file):
-        self.maxid = file.read_uint()
+        buf = getattr(file, "map", None)
+        if buf is not None:
+            pos = file.tell()
+            self.maxid = _UINT.unpack_from(buf, pos)[0]
+            file.seek(pos + _UINT.size)
+        else:
+            self.maxid = int.from_bytes(file.read(_INT_SIZE), "big")
 
     @staticmethod
-    def from_file(file, stringids=False):
-        (
-            nextoffset,
-            xi1,
-            postcount,
-            maxweight,
-            maxwol,
-            xf1,
-            minlength,
-        ) = BlockInfo._struct.unpack(file.read(BlockInfo._struct.size))
+    def read_min(file, offset, stringids=False):
+        # Returns only the (nextoffset, flags, postcount, dataoffset) of the
+        # block at the given offset, for callers that just iterate over IDs
+        # and don't need the statistics or the decoded max ID
+        head = BlockInfo._head_struct
+        buf = getattr(file, "map", None)
+        if buf is not None:
+            nextoffset, flags, postcount = head.unpack_from(buf, offset)
+        else:
+            file.seek(offset)
+            nextoffset, flags, postcount = head.unpack(file.read(head.size))
+
+        pos = offset + BlockInfo._SIZE
+        if stringids and buf is not None:
+            # Skip over the length-prefixed max ID
+            length, pos = _varint_at(buf, pos)
+            return (nextoffset, flags, postcount, pos + length)
+        elif stringids:
+            file.seek(pos)
+            length = file.read_varint()
+            return (nextoffset, flags, postcount, file.tell() + length)
+        else:
+            return (nextoffset, flags, postcount, pos + _UINT.size)
+
+    @staticmethod
+    def from_file(file, offset, stringids=False):
+        # Reads the block info at the given offset, leaving the file pointer at
+        # the start of the block's data
+        size = BlockInfo._SIZE
+        buf = getattr(file, "map", None)
+        if buf is not None:
+            # Unpack straight out of the mapped file instead of reading the
+            # header into a temporary bytes object first
+            fields = BlockInfo._UNPACK(buf, offset)
+            pos = offset + size
+        else:
+            file.seek(offset)
+            fields = BlockInfo._struct.unpack(file.read(size))
+        nextoffset, flags, postcount, maxweight, maxwol, _, minlength = fields
         assert postcount > 0
-        minlength = byte_to_length(minlength)
 
-        if stringids:
+        if buf is not None:
+            # Work out the data offset from positions in the buffer instead of
+            # seeking, so a mapped file can be shared between readers
+            if stringids:
+                length, pos = _varint_at(buf, pos)
+                maxid = utf8decode(buf[pos : pos + length])[0]
+                dataoffset = pos + length
+            else:
+                maxid = _UINT.unpack_from(buf, pos)[0]
+                dataoffset = pos + _INT_SIZE
+        elif stringids:
             maxid = utf8decode(file.read_string())[0]
+            dataoffset = file.tell()
         else:
-            maxid = file.read_uint()
+            # int.from_bytes skips the tuple a single-field unpack creates
+            maxid = int.from_bytes(file.read(_INT_SIZE), "big")
+            dataoffset = file.tell()
 
-        dataoffset = file.tell()
         return BlockInfo(
-            nextoffset=nextoffset,
-            postcount=postcount,
-            maxweight=maxweight,
-            maxwol=maxwol,
-            maxid=maxid,
-            minlength=minlength,
-            dataoffset=dataoffset,
+            nextoffset,
+            postcount,
+            maxweight,
+            maxwol,
+            _BYTE_LENGTHS[minlength],
+            maxid,
+            dataoffset,
+            flags,
         )
 
 
-class FilePostingWriter(PostingWriter):
+class FilePostingWriter:
     def __init__(self, schema, postfile, stringids=False, blocklimit=128):
         self.schema = schema
         self.postfile = postfile
@@ -139,15 +234,23 @@ class FilePostingWriter(PostingWriter):
             raise ValueError("blocklimit argument must be > 0")
         self.blocklimit = blocklimit
         self.inblock = False
+        # A function taking a document number and field number and returning
+        # the length of the field in the document. Without one, the blocks
+        # are written without the minimum length and max weight/length stats
+        self.dfl_fn = None
+
+        # Allocate the block buffers once and reuse them for every block,
+        # using self._n as the number of postings in the current block. The
+        # weights are decoded from the values when the block is written.
+        if stringids:
+            self.blockids = [None] * blocklimit
+        else:
+            self.blockids = array("I", [0]) * blocklimit
+        self.blockvalues = [None] * blocklimit
+        self._n = 0
 
     def _reset_block(self):
-        if self.stringids:
-            self.blockids = []
-        else:
-            self.blockids = array("I")
-        self.blockweights = array("f")
-        self.blockvalues = []
-        self.blockoffset = self.postfile.tell()
+        self._n = 0
 
     def start(self, fieldnum):
         if self.inblock:
@@ -157,109 +260,136 @@ class FilePostingWriter(PostingWriter):
         self.format = self.schema[fieldnum].format
         self.blockcount = 0
         self.posttotal = 0
+        # The block count is written in front of the first block by
+        # _write_block(), so a list that fits in a single block never has to
+        # seek back to fill it in
         self.startoffset = self.postfile.tell()
 
-        # Placeholder for block count
-        self.postfile.write_uint(0)
-
         self._reset_block()
         self.inblock = True
 
         return self.startoffset
 
     def write(self, id, valuestring):
-        self.blockids.append(id)
-        self.blockvalues.append(valuestring)
-        self.blockweights.append(self.format.decode_weight(valuestring))
-        if len(self.blockids) >= self.blocklimit:
+        n = self._n
+        self.blockids[n] = id
+        self.blockvalues[n] = valuestring
+        self._n = n = n + 1
+        if n >= self.blocklimit:
             self._write_block()
 
     def finish(self):
         if not self.inblock:
             raise Exception("Called finish() when not in a block")
 
-        if self.blockids:
-            self._write_block()
-
-        # Seek back to the start of this list of posting blocks and writer the
-        # number of blocks
         pf = self.postfile
-        pf.flush()
-        offset = pf.tell()
-        pf.seek(self.startoffset)
-        pf.write_uint(self.blockcount)
-        pf.seek(offset)
+        if not self.blockcount:
+            # Nothing has been written yet, so the count can be written along
+            # with the one and only block (or on its own if there are none)
+            if self._n:
+                self._write_block(last=True)
+            else:
+                pf.write(_UINT_ZERO)
+        else:
+            if self._n:
+                self._write_block()
+
+            # Seek back to the start of this list of posting blocks and write
+            # the number of blocks over the placeholder
+            offset = pf.tell()
+            pf.seek(self.startoffset)
+            pf.write(_UINT.pack(self.blockcount))
+            pf.seek(offset)
 
         self.inblock = False
         return self.posttotal
 
     def close(self):
-        if hasattr(self, "blockids") and self.blockids:
+        # Finish an open list even if it's empty, so the offset returned by
+        # start() still points at a block count
+        if self.inblock:
             self.finish()
         self.postfile.close()
 
-    def _write_block(self):
+    def _write_block(self, last=False):
         posting_size = self.format.posting_size
         dfl_fn = self.dfl_fn
         fieldnum = self.fieldnum
         stringids = self.stringids
         pf = self.postfile
+        postcount = self._n
+        # Only the first postcount items of the reused buffers belong to this
+        # block. Read them through islice() instead of copying them out
         ids = self.blockids
         values = self.blockvalues
-        weights = self.blockweights
-        postcount = len(ids)
+        # Decode the weights for the whole block at once
+        weights = array("f", map(self.format.decode_weight, islice(values, postcount)))
 
-        # Write the blockinfo
-        maxid = ids[-1]
+        # Compute the blockinfo statistics
+        maxid = ids[postcount - 1]
         maxweight = max(weights)
         maxwol = 0.0
         minlength = 0
         if dfl_fn and self.schema[fieldnum].scorable:
-            lens = [dfl_fn(id, fieldnum) for id in ids]
+            lens = [dfl_fn(id, fieldnum) for id in islice(ids, postcount)]
             minlength = min(lens)
             assert minlength > 0
-            maxwol = max(w / l for w, l in zip(weights, lens))
-
-        blockinfo_start = pf.tell()
-        blockinfo = BlockInfo(
-            nextoffset=0,
-            maxweight=maxweight,
-            maxwol=maxwol,
-            minlength=minlength,
-            postcount=postcount,
-            maxid=maxid,
-        )
-        blockinfo.to_file(pf)
-
-        # Write the IDs
+            # Let map() do the division loop in C instead of a generator
+            maxwol = max(map(truediv, weights, lens))
+
+        # Assemble the block data in memory so the whole block (including the
+        # header, which needs to know where the block ends) can be written in
+        # one call instead of writing a placeholder header and seeking back
+        # to patch it
+        parts = []
+        append = parts.append
+
+        # The IDs
+        flags = 0
         if stringids:
-            for id in ids:
-                pf.write_string(utf8encode(id)[0])
+            for id in islice(ids, postcount):
+                encoded = utf8encode(id)[0]
+                append(varint(len(encoded)))
+                append(encoded)
         else:
-            pf.write_array(ids)
+            # The IDs are sorted, so store the gaps between them as varints,
+            # which usually takes a byte or two per ID instead of four
+            flags |= _DELTA_IDS
+            prev = 0
+            for id in islice(ids, postcount):
+                append(varint(id - prev))
+                prev = id
 
-        # Write the weights
-        pf.write_array(weights)
+        # The weights
+        append(_array_bytes(weights))
 
         # If the size of a posting value in this format is not fixed
-        # (represented by a number less than zero), write an array of value
-        # lengths
+        # (represented by a number less than zero), the array of value lengths
         if posting_size < 0:
-            lengths = array("I")
-            for valuestring in values:
-                lengths.append(len(valuestring))
-            pf.write_array(lengths)
+            append(_array_bytes(array("I", map(len, islice(values, postcount)))))
 
-        # Write the values
+        # The values
         if posting_size != 0:
-            pf.write("".join(values))
+            parts.extend(islice(values, postcount))
+
+        # The first block is preceded by the block count for the list. If it's
+        # also the last block, the count is known now; otherwise write a
+        # placeholder that finish() will overwrite.
+        if not self.blockcount:
+            prefix = _UINT.pack(1) if last else _UINT_ZERO
+        else:
+            prefix = b""
 
-        # Seek back and write the pointer to the next block
-        pf.flush()
-        nextoffset = pf.tell()
-        pf.seek(blockinfo_start)
-        pf.write_uint(nextoffset)
-        pf.seek(nextoffset)
+        data = b"".join(parts)
+        blockinfo = BlockInfo(
+            0, postcount, maxweight, maxwol, minlength, maxid, flags=flags
+        )
+        header = bytearray(blockinfo.to_bytes())
+        # Fill in the pointer to the next block, which is the first field of
+        # the header
+        nextoffset = pf.tell() + len(prefix) + len(header) + len(data)
+        _UINT.pack_into(header, 0, nextoffset)
+        pf.write(b"".join((prefix, header, data)))
 
         self.posttotal += postcount
         self._reset_block()
@@ -268,29 +398,72 @@ class FilePostingWriter(PostingWriter):
 
 class FilePostingReader(Matcher):
     def __init__(self, postfile, offset, format, scorefns=None, stringids=False):
-        self.postfile = postfile
-        self.startoffset = offset
-        self.format = format
-        # Bind the score and quality functions to this object as methods
-
         self._scorefns = scorefns
         if scorefns:
+            # Scorers make new functions per term or searcher, so bind them
+            # to this object rather than caching anything keyed on them
             sfn, qfn, bqfn = scorefns
             if sfn:
-                self.score = types.MethodType(sfn, self, self.__class__)
+                self.score = MethodType(sfn, self)
             if qfn:
-                self.quality = types.MethodType(qfn, self, self.__class__)
+                self.quality = MethodType(qfn, self)
             if bqfn:
-                self.block_quality = types.MethodType(bqfn, self, self.__class__)
-
+                self.block_quality = MethodType(bqfn, self)
         self.stringids = stringids
+        # Called with this reader when it's closed, e.g. to return it to a
+        # pool of readers for reuse
+        self.onclose = None
+
+        self._set_format(format)
+        self._start(postfile, offset)
 
-        self.blockcount = postfile.get_uint(offset)
+    def _set_format(self, format):
+        self.format = format
+        self._posting_size = posting_size = format.posting_size
+        if posting_size > 0:
+            self._read_values = self._read_fixed_values
+        elif posting_size < 0:
+            self._read_values = self._read_variable_values
+        else:
+            self._read_values = self._read_no_values
+
+    def _start(self, postfile, offset):
+        self.postfile = postfile
+        self.startoffset = offset
+        self._map = buf = getattr(postfile, "map", None)
+
+        if buf is not None:
+            self.blockcount = _UINT.unpack_from(buf, offset)[0]
+        else:
+            self.blockcount = int.from_bytes(postfile.get(offset, _INT_SIZE), "big")
         self.baseoffset = offset + _INT_SIZE
         self._active = True
         self.currentblock = -1
         self._next_block()
 
+    def reset(self, postfile, offset, format):
+        """Points this reader at the posting list starting at ``offset`` in
+        the given file, so the object can be reused to read another term
+        instead of creating a new reader.
+        """
+
+        if format is not self.format:
+            self._set_format(format)
+        self._start(postfile, offset)
+
+    def close(self):
+        onclose = self.onclose
+        if onclose is not None:
+            # Only hand the reader back once, even if it's closed again
+            self.onclose = None
+            onclose(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def copy(self):
         return self.__class__(
             self.postfile,
@@ -307,21 +480,69 @@ class FilePostingReader(Matcher):
         return self.ids[self.i]
 
     def value(self):
-        return self.values[self.i]
+        values = self.values
+        if values is None:
+            # The values for this block haven't been needed until now
+            blockinfo = self.blockinfo
+            values = self.values = self._read_values(
+                self._valueoffset, blockinfo.nextoffset, blockinfo.postcount
+            )
+        return values[self.i]
 
     def weight(self):
         return self.weights[self.i]
 
+    # The IDs and weights of the current block are kept as parallel arrays,
+    # so callers that work a block at a time can use them directly instead of
+    # calling id()/weight()/next() for every posting
+
+    def block_ids(self):
+        """Returns the array of IDs in the current block."""
+
+        return self.ids
+
+    def block_weights(self):
+        """Returns the array of weights in the current block, parallel to
+        :meth:`block_ids`.
+        """
+
+        return self.weights
+
+    def block_min_length(self):
+        return self.blockinfo.minlength
+
+    def block_max_weight(self):
+        return self.blockinfo.maxweight
+
+    def block_max_wol(self):
+        return self.blockinfo.maxwol
+
+    def next_block(self):
+        """Moves to the start of the next block, skipping any postings left in
+        the current one. After this the reader is either inactive or
+        :meth:`block_ids` and :meth:`block_weights` return the new block.
+        """
+
+        if not self._active:
+            raise ReadTooFar
+        self._next_block()
+
     def all_ids(self):
+        pf = self.postfile
+        stringids = self.stringids
         nextoffset = self.baseoffset
         for _ in range(self.blockcount):
-            blockinfo = self._read_blockinfo(nextoffset)
-            nextoffset = blockinfo.nextoffset
-            ids, __ = self._read_ids(blockinfo.dataoffset, blockinfo.postcount)
+            nextoffset, flags, postcount, dataoffset = BlockInfo.read_min(
+                pf, nextoffset, stringids
+            )
+            ids, __ = self._read_ids(dataoffset, postcount, flags)
             yield from ids
 
     def next(self):
-        if self.i == self.blockinfo.postcount - 1:
+        # This is called once per posting, so compare against the last index
+        # computed when the block was consumed instead of going through the
+        # blockinfo object on every call
+        if self.i == self._lastindex:
             self._next_block()
             return True
         else:
@@ -343,82 +564,155 @@ class FilePostingReader(Matcher):
         if not self._active:
             return
 
-        # Iterate through the IDs in the block until we find or pass the
-        # target
+        # The IDs in the block are sorted, so binary search for the first one
+        # that's not less than the target
         ids = self.ids
-        i = self.i
-        while ids[i] < id:
-            i += 1
-            if i == len(ids):
-                self._active = False
-                return
+        i = bisect_left(ids, id, self.i)
+        if i == len(ids):
+            self._active = False
+            return
         self.i = i
 
     def _read_blockinfo(self, offset):
-        pf = self.postfile
-        pf.seek(offset)
-        return BlockInfo.from_file(pf, self.stringids)
-
-    def _read_ids(self, offset, postcount):
-        pf = self.postfile
-        pf.seek(offset)
-
-        if self.stringids:
+        return BlockInfo.from_file(self.postfile, offset, self.stringids)
+
+    def _get_array(self, offset, typecode, length):
+        # Decodes an array straight out of the mapped file if there is one,
+        # instead of seeking and reading through the file object
+        buf = self._map
+        if buf is None:
+            return self.postfile.get_array(offset, typecode, length)
+
+        a = array(typecode)
+        with memoryview(buf) as mv:
+            a.frombytes(mv[offset : offset + length * a.itemsize])
+        if IS_LITTLE:
+            a.byteswap()
+        return a
+
+    def _read_string_ids(self, offset, postcount):
+        buf = self._map
+        if buf is None:
+            pf = self.postfile
+            pf.seek(offset)
             rs = pf.read_string
             ids = [utf8decode(rs())[0] for _ in range(postcount)]
+            return (ids, pf.tell())
+
+        # Walk the varint-prefixed strings in the mapped block in a single
+        # loop, decoding each one straight from a view of the buffer instead
+        # of going through read_varint()/read() on the file for every ID
+        ids = []
+        pos = offset
+        with memoryview(buf) as mv:
+            for _ in range(postcount):
+                b = mv[pos]
+                pos += 1
+                length = b & 0x7F
+                shift = 7
+                while b & 0x80:
+                    b = mv[pos]
+                    pos += 1
+                    length |= (b & 0x7F) << shift
+                    shift += 7
+                ids.append(str(mv[pos : pos + length], "utf8"))
+                pos += length
+        return (ids, pos)
+
+    def _read_delta_ids(self, offset, postcount):
+        # Rebuilds the IDs from the varint-encoded gaps between them
+        ids = array("I")
+        buf = self._map
+        if buf is None:
+            pf = self.postfile
+            pf.seek(offset)
+            rv = pf.read_varint
+            id = 0
+            for _ in range(postcount):
+                id += rv()
+                ids.append(id)
+            return (ids, pf.tell())
+
+        pos = offset
+        id = 0
+        with memoryview(buf) as mv:
+            for _ in range(postcount):
+                b = mv[pos]
+                pos += 1
+                gap = b & 0x7F
+                shift = 7
+                while b & 0x80:
+                    b = mv[pos]
+                    pos += 1
+                    gap |= (b & 0x7F) << shift
+                    shift += 7
+                id += gap
+                ids.append(id)
+        return (ids, pos)
+
+    def _read_ids(self, offset, postcount, flags=0):
+        if self.stringids:
+            return self._read_string_ids(offset, postcount)
+        elif flags & _DELTA_IDS:
+            return self._read_delta_ids(offset, postcount)
         else:
-            ids = pf.read_array("I", postcount)
-
-        return (ids, pf.tell())
+            ids = self._get_array(offset, "I", postcount)
+            return (ids, offset + _INT_SIZE * postcount)
 
     def _read_weights(self, offset, postcount):
-        weights = self.postfile.get_array(offset, "f", postcount)
+        weights = self._get_array(offset, "f", postcount)
         return (weights, offset + _FLOAT_SIZE * postcount)
 
-    def _read_values(self, startoffset, endoffset, postcount):
-        pf = self.postfile
-        posting_size = self.format.posting_size
-
-        if posting_size != 0:
-            valueoffset = startoffset
-            if posting_size < 0:
-                # Read the array of lengths for the values
-                lengths = pf.get_array(startoffset, "I", postcount)
-                valueoffset += _INT_SIZE * postcount
-
-            allvalues = pf.map[valueoffset:endoffset]
-
-            # Chop up the block string into individual valuestrings
-            if posting_size > 0:
-                # Format has a fixed posting size, just chop up the values
-                # equally
-                values = [
-                    allvalues[i * posting_size : i * posting_size + posting_size]
-                    for i in range(postcount)
-                ]
-            else:
-                # Format has a variable posting size, use the array of lengths
-                # to chop up the values.
-                pos = 0
-                values = []
-                for length in lengths:
-                    values.append(allvalues[pos : pos + length])
-                    pos += length
-        else:
-            # Format does not store values (i.e. Existence), just create fake
-            # values
-            values = (None,) * postcount
-
+    def _value_view(self, startoffset, endoffset):
+        # Returns a memoryview of the given region of the postings file, so
+        # slicing individual values out of it doesn't copy them
+        if self._map is not None:
+            return memoryview(self._map)[startoffset:endoffset]
+        return memoryview(self.postfile.get(startoffset, endoffset - startoffset))
+
+    # One of the following methods is used as _read_values depending on the
+    # format's posting_size, so the choice is made once per reader instead of
+    # on every block
+
+    def _read_fixed_values(self, startoffset, endoffset, postcount):
+        # Format has a fixed posting size, just chop up the values equally
+        size = self._posting_size
+        allvalues = self._value_view(startoffset, endoffset)
+        return [allvalues[i : i + size] for i in range(0, postcount * size, size)]
+
+    def _read_variable_values(self, startoffset, endoffset, postcount):
+        # Format has a variable posting size, use the array of lengths before
+        # the values to chop them up
+        lengths = self._get_array(startoffset, "I", postcount)
+        allvalues = self._value_view(startoffset + _INT_SIZE * postcount, endoffset)
+        pos = 0
+        values = []
+        for length in lengths:
+            values.append(allvalues[pos : pos + length])
+            pos += length
         return values
 
+    def _read_no_values(self, startoffset, endoffset, postcount):
+        # Format does not store values (i.e. Existence), just create fake
+        # values
+        return (None,) * postcount
+
     def _consume_block(self):
         postcount = self.blockinfo.postcount
-        self.ids, woffset = self._read_ids(self.blockinfo.dataoffset, postcount)
-        self.weights, voffset = self._read_weights(woffset, postcount)
-        self.values = self._read_values(voffset, self.blockinfo.nextoffset, postcount)
+        self.ids, woffset = self._read_ids(
+            self.blockinfo.dataoffset, postcount, self.blockinfo.flags
+        )
+        self.weights, self._valueoffset = self._read_weights(woffset, postcount)
+        # Many matchers only look at IDs and weights, so don't split up the
+        # values until value() is called for a posting in this block
+        self.values = None
         self.i = 0
+        self._lastindex = postcount - 1
 
     def _next_block(self, consume=True):
+        # Each block's header is read exactly once as we advance, and its
+        # contents are only decoded if consume is True (_skip_to_block passes
+        # False while it's only looking at headers)
         self.currentblock += 1
         if self.currentblock == self.blockcount:
             self._active = False
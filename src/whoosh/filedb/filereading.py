@@ -14,8 +14,24 @@
 # limitations under the License.
 # ===============================================================================
 
-from marshal import loads
-from threading import Lock
+import os
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from itertools import chain, filterfalse, islice, takewhile
+from keyword import iskeyword
+from operator import itemgetter
+from sys import maxunicode
+from threading import Lock, local
+from typing import NamedTuple
+from weakref import WeakValueDictionary
+
+from cached_property import cached_property, threaded_cached_property
+
+try:
+    import mmap
+except ImportError:
+    mmap = None
 
 from whoosh.fields import FieldConfigurationError
 from whoosh.filedb import misc
@@ -26,53 +42,241 @@ from whoosh.filedb.filetables import (
     LengthReader,
     StructHashReader,
 )
+from whoosh.idsets import BitSet
 
 # from whoosh.postings import Exclude
 from whoosh.reading import IndexReader, TermNotFound
-from whoosh.util import byte_to_length, protected
+from whoosh.util.numeric import _BYTE_LENGTHS
+
+# Access pattern hint for the term index, which is probed at random
+_MADV_RANDOM = getattr(mmap, "MADV_RANDOM", None)
+_MADV_WILLNEED = getattr(mmap, "MADV_WILLNEED", None)
+_MADV_SEQUENTIAL = getattr(mmap, "MADV_SEQUENTIAL", None)
+_MADV_NORMAL = getattr(mmap, "MADV_NORMAL", None)
+
+# Number of documents all_stored_fields() reads per lock acquisition
+_STORED_BATCH = 64
+
+
+def _map_file(storage, dbfile):
+    # Returns a read-only memory map of the given open file, or None if the
+    # storage, the platform, or the file doesn't allow it
+    if not (mmap and getattr(storage, "supports_mmap", False) and dbfile.is_real):
+        return None
+    try:
+        return mmap.mmap(dbfile.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # ValueError means the file is empty
+        return None
+
+
+def _close_map(dbfile):
+    try:
+        dbfile.map.close()
+    except BufferError:
+        # Views of the map are still alive, so leave it to be closed when
+        # they're garbage collected
+        pass
+
+
+def _open_mapped(storage, name, advice=None):
+    # Opens the named file and, if it can be mapped, attaches the map as the
+    # file's "map" attribute, which the legacy table and posting readers use
+    # instead of seeking and reading
+    dbfile = storage.open_file(name)
+    buf = _map_file(storage, dbfile)
+    if buf is not None:
+        if advice is not None:
+            buf.madvise(advice)
+        dbfile.map = buf
+        dbfile.onclose = _close_map
+    return dbfile
+
+
+def _will_need(dbfile, offsets, length):
+    # Tells the OS that the given regions of the file will be read soon, so
+    # it can start reading them all in at once instead of waiting for each
+    # read in turn. This is only a hint, so do nothing if it's not supported
+    buf = getattr(dbfile, "map", None)
+    if buf is not None:
+        madvise = getattr(buf, "madvise", None)
+        if madvise is None or _MADV_WILLNEED is None:
+            return
+        size = len(buf)
+        for offset in offsets:
+            # madvise() needs a page-aligned start
+            start = offset - offset % mmap.PAGESIZE
+            madvise(_MADV_WILLNEED, start, min(offset + length, size) - start)
+    elif dbfile.is_real and hasattr(os, "posix_fadvise"):
+        try:
+            fd = dbfile.fileno()
+        except OSError:
+            # In-memory files have a fileno() method that raises
+            return
+        try:
+            for offset in offsets:
+                os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            # The advice is only a hint
+            pass
+
+
+def _advise_sequential(dbfile, sequential=True):
+    # Tells the OS whether the whole file is about to be read from start to
+    # finish, so it reads ahead more aggressively, or goes back to normal
+    # access. This is only a hint, so do nothing if it's not supported
+    buf = getattr(dbfile, "map", None)
+    if buf is not None:
+        madvise = getattr(buf, "madvise", None)
+        advice = _MADV_SEQUENTIAL if sequential else _MADV_NORMAL
+        if madvise is not None and advice is not None:
+            madvise(advice)
+    elif dbfile.is_real and hasattr(os, "posix_fadvise"):
+        if sequential:
+            advice = os.POSIX_FADV_SEQUENTIAL
+        else:
+            advice = os.POSIX_FADV_NORMAL
+        try:
+            os.posix_fadvise(dbfile.fileno(), 0, 0, advice)
+        except OSError:
+            # In-memory files have a fileno() method that raises
+            pass
+
+
+def _term_row(item):
+    # Turns a ((fieldnum, text), (totalfreq, offset, postcount)) item from the
+    # term index into the (fieldnum, text, postcount, totalfreq) tuple the
+    # reader iterators return
+    (fieldnum, text), terminfo = item
+    return (fieldnum, text, terminfo[2], terminfo[0])
+
+
+def _prefix_stop(fieldnum, prefix):
+    # Returns the smallest term key that sorts after every term in the given
+    # field that starts with the given prefix
+    prefix = prefix.rstrip(chr(maxunicode))
+    if prefix:
+        return (fieldnum, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    return (fieldnum + 1, "")
+
+
+class _StoredFieldsView(Mapping):
+    # A read-only mapping of stored field names to values over a document's
+    # cached row, for callers that only look at a few of the fields once and
+    # don't need their own dictionary
+
+    __slots__ = ("_positions", "_row")
+
+    def __init__(self, positions, row):
+        self._positions = positions
+        self._row = row
+
+    def __getitem__(self, name):
+        return self._row[self._positions[name]]
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+# Open readers, shared between callers by get_segment_reader()
+_shared_readers = WeakValueDictionary()
+_shared_readers_lock = Lock()
+
+
+def get_segment_reader(storage, segment, schema):
+    """Returns a :class:`SegmentReader` for the given segment. If another
+    caller already has a reader open on the same segment object in the same
+    storage, that reader (and its open files) is shared instead of opening
+    the segment's files again. Each caller should close the reader when it's
+    done with it; the files are closed when the last caller closes it.
+    """
+
+    key = (id(storage), id(segment))
+    with _shared_readers_lock:
+        reader = _shared_readers.get(key)
+        if (
+            reader is not None
+            and not reader.is_closed
+            and reader.storage is storage
+            and reader.segment is segment
+            and reader.schema is schema
+        ):
+            reader._refs += 1
+            return reader
+
+        reader = SegmentReader(storage, segment, schema)
+        _shared_readers[key] = reader
+        return reader
+
 
 # Reader class
 
 
 class SegmentReader(IndexReader):
+    # Maximum number of decoded stored field dictionaries to keep around for
+    # repeated stored_fields() calls on the same documents
+    stored_cache_size = 512
+    # Documents with a stored string longer than this aren't kept in the
+    # cache, so a few large blobs don't pin memory and push out many small
+    # documents
+    stored_cache_max_value = 64 * 1024
+    # Maximum number of term info tuples (or misses) to keep around for
+    # repeated lookups of the same terms
+    terminfo_cache_size = 8192
+    # Maximum number of closed posting readers to keep for reuse by postings()
+    postreader_pool_size = 32
+    # Maximum number of expand_prefix() results to keep for repeated prefixes
+    # (e.g. autocompletion), and the most terms a result can have to be kept
+    prefix_cache_size = 256
+    prefix_cache_max_terms = 1024
+    # Number of bytes from the start of each posting list that
+    # postings_batch() asks the OS to read ahead
+    postings_readahead = 64 * 1024
+    # Number of bytes from the start of each vector that vectors_batch() asks
+    # the OS to read ahead
+    vectors_readahead = 8 * 1024
+    # Mapped term index files up to this size are read into the OS cache in
+    # full when they're opened, since every term lookup probes them at random
+    preload_termsindex_size = 8 * 1024 * 1024
+
     def __init__(self, storage, segment, schema):
         self.storage = storage
         self.segment = segment
         self.schema = schema
 
-        storedfieldnames = schema.stored_field_names()
-
-        def decode_storedfields(value):
-            return dict(zip(storedfieldnames, loads(value)))
+        # The term index, stored fields, and field lengths are opened lazily
+        # by the properties below, so a reader that's only asked for counts or
+        # deletions doesn't pay for opening them. The properties lock on their
+        # own instead of using _sync_lock, because they can be first touched
+        # by code that already holds it
 
-        # Term index
-        tf = storage.open_file(segment.termsindex_filename)
-        self.termsindex = FileTableReader(
-            tf,
-            keycoder=misc.encode_termkey,
-            keydecoder=misc.decode_termkey,
-            valuedecoder=misc.decode_terminfo,
-        )
-
-        # Term postings file, vector index, and vector postings: lazy load
-        self.postfile = None
+        # Term postings files, vector index, and vector postings: lazy load
+        self._shared_postfile = None
+        self._postfile_local = local()
+        self._postfiles = []
         self.vectorindex = None
         self.vpostfile = None
 
-        # Stored fields file
-        sf = storage.open_file(segment.storedfields_filename, mapped=False)
-        self.storedfields = FileListReader(sf, valuedecoder=decode_storedfields)
-
-        # Field length file
-        scorables = schema.scorable_fields()
-        if scorables:
-            self.indices = {fieldnum: i for i, fieldnum in enumerate(scorables)}
-            lengthcount = segment.doc_count_all() * len(self.indices)
-            flf = storage.open_file(segment.fieldlengths_filename)
-            self.fieldlengths = flf.read_array("B", lengthcount)
-            flf.close()
-        else:
-            self.fieldlengths = []
+        self._stored_cache = OrderedDict()
+        self._terminfo_cache = OrderedDict()
+        self._prefix_cache = OrderedDict()
+        # Field numbers by name (and by number, for callers that already have
+        # one), so the query methods don't ask the schema every time
+        self._fieldnums = {name: schema.to_number(name) for name in schema.names()}
+        self._fieldnums.update((num, num) for num in list(self._fieldnums.values()))
+        self._postreader_pool = deque(maxlen=self.postreader_pool_size)
+        self._deleted_bits = None
+        # Number of callers sharing this reader through get_segment_reader()
+        self._refs = 1
 
         # Copy methods from underlying segment
         self.has_deletions = segment.has_deletions
@@ -81,166 +285,642 @@ class SegmentReader(IndexReader):
 
         self.dc = segment.doc_count_all()
         self.is_closed = False
+        # Serializes reads that seek a shared file (cache misses in the term
+        # index, stored fields, and vector index)
         self._sync_lock = Lock()
+        # Guard for opening the vector files, which is only taken until the
+        # files are open
+        self._vectors_once = Lock()
+        self._postfiles_lock = Lock()
+
+    @threaded_cached_property
+    def termsindex(self):
+        tf = _open_mapped(self.storage, self.segment.termsindex_filename, _MADV_RANDOM)
+        buf = getattr(tf, "map", None)
+        if buf is not None and len(buf) <= self.preload_termsindex_size:
+            # Fault the whole (small) index in up front, so the first lookups
+            # after opening, or after the pages were reclaimed, don't each
+            # wait for a disk read
+            _will_need(tf, (0,), len(buf))
+        return FileTableReader(
+            tf,
+            keycoder=misc.encode_termkey,
+            keydecoder=misc.decode_termkey,
+            valuedecoder=misc.decode_terminfo,
+        )
+
+    @threaded_cached_property
+    def storedfields(self):
+        decode_storedfields = misc.storedfields_decoder(
+            self.schema.stored_field_names()
+        )
+        sf = self._storedfile = _open_mapped(
+            self.storage, self.segment.storedfields_filename
+        )
+        return FileListReader(sf, valuedecoder=decode_storedfields)
+
+    @cached_property
+    def _stored_names(self):
+        return tuple(self.schema.stored_field_names())
+
+    @cached_property
+    def _stored_positions(self):
+        return {name: i for i, name in enumerate(self._stored_names)}
+
+    @cached_property
+    def _stored_row_type(self):
+        # Field names that can't be attribute names are renamed to field_0,
+        # field_1, etc. (by position, with underscores added until the name is
+        # unused), so stored_fields() zips the values with the real names
+        # instead of using _asdict()
+        taken = set(self._stored_names)
+        fields = []
+        for i, name in enumerate(self._stored_names):
+            if not name.isidentifier() or iskeyword(name) or name.startswith("_"):
+                name = f"field_{i}"
+                while name in taken:
+                    name += "_"
+                taken.add(name)
+            fields.append((name, object))
+        return NamedTuple("StoredRow", fields)
+
+    @property
+    def _deleted_docs(self):
+        # The segment's deleted documents as a bit set, kept between calls
+        # instead of copying the segment's set on every postings() call.
+        # Unioning it with a BitSet filter from the searcher is a bytewise
+        # operation. Documents can be deleted from the segment while the
+        # reader is open, so the bit set is rebuilt when the count changes
+        deleted = self.segment.deleted
+        if not deleted:
+            return None
+        cached = self._deleted_bits
+        if cached is None or cached[0] != len(deleted):
+            cached = self._deleted_bits = (len(deleted), BitSet(deleted, size=self.dc))
+        return cached[1]
+
+    @cached_property
+    def indices(self):
+        scorables = self.schema.scorable_fields()
+        return {fieldnum: i for i, fieldnum in enumerate(scorables)}
+
+    @cached_property
+    def _length_bases(self):
+        # Offset of each scorable field's run of lengths in the field lengths
+        # file, so looking up a length doesn't need a multiplication
+        dc = self.dc
+        return {fieldnum: i * dc for fieldnum, i in self.indices.items()}
+
+    @cached_property
+    def _doc_major_lengths(self):
+        # The field lengths transposed so each document's lengths for all the
+        # scorable fields are next to each other, for callers that want every
+        # field of one document rather than one field of every document
+        n = len(self.indices)
+        dc = self.dc
+        transposed = bytearray(n * dc)
+        if n:
+            with memoryview(self.fieldlengths) as fieldlengths:
+                for i in range(n):
+                    transposed[i::n] = fieldlengths[i * dc : (i + 1) * dc]
+        return bytes(transposed)
+
+    @threaded_cached_property
+    def fieldlengths(self):
+        if not self.indices:
+            return []
+
+        storage = self.storage
+        lengthcount = self.dc * len(self.indices)
+        flf = storage.open_file(self.segment.fieldlengths_filename)
+        buf = _map_file(storage, flf) if lengthcount else None
+        if buf is not None:
+            # Map the file instead of copying it into an array, so the OS
+            # pages the lengths in as they're used and readers of the same
+            # segment share the memory
+            self._fieldlengths_map = buf
+            fieldlengths = memoryview(buf)[:lengthcount]
+        else:
+            fieldlengths = flf.read_array("B", lengthcount)
+        flf.close()
+        return fieldlengths
 
     def _open_vectors(self):
-        if self.vectorindex:
+        if self.vectorindex is not None:
             return
 
-        storage, segment = self.storage, self.segment
+        with self._vectors_once:
+            if self.vectorindex is not None:
+                return
+            storage, segment = self.storage, self.segment
 
-        # Vector index
-        vf = storage.open_file(segment.vectorindex_filename)
-        self.vectorindex = StructHashReader(vf, "!IH", "!I")
+            # Vector postings file
+            self.vpostfile = _open_mapped(storage, segment.vectorposts_filename)
 
-        # Vector postings file
-        self.vpostfile = storage.open_file(segment.vectorposts_filename, mapped=False)
+            # Vector index. This is assigned last because other threads check
+            # it (without the lock) to see whether the vectors are open
+            vf = storage.open_file(segment.vectorindex_filename)
+            self.vectorindex = StructHashReader(vf, "!IH", "!I")
 
     def _open_postfile(self):
-        if self.postfile:
-            return
-        self.postfile = self.storage.open_file(
-            self.segment.termposts_filename, mapped=False
-        )
+        postfile = self._shared_postfile
+        if postfile is not None:
+            return postfile
+
+        # Each thread gets its own handle on an unmapped postings file,
+        # because the posting readers seek and read, so concurrent queries
+        # sharing one handle would interfere with each other
+        threadlocal = self._postfile_local
+        postfile = getattr(threadlocal, "postfile", None)
+        if postfile is None:
+            postfile = _open_mapped(self.storage, self.segment.termposts_filename)
+            with self._postfiles_lock:
+                self._postfiles.append(postfile)
+            if getattr(postfile, "map", None) is not None:
+                # Reading from the map never moves the file pointer, so every
+                # thread can share this handle
+                self._shared_postfile = postfile
+            else:
+                threadlocal.postfile = postfile
+        return postfile
+
+    def _to_number(self, fieldid):
+        # The schema doesn't change for the life of the reader. Field ids that
+        # weren't filled in up front are passed to the schema (which raises
+        # the usual error for unknown fields) and remembered
+        try:
+            return self._fieldnums[fieldid]
+        except KeyError:
+            fieldnum = self._fieldnums[fieldid] = self.schema.to_number(fieldid)
+            return fieldnum
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self.segment})"
 
-    @protected
     def __contains__(self, term):
-        return (self.schema.to_number(term[0]), term[1]) in self.termsindex
+        return self._term_info_or(self._to_number(term[0]), term[1]) is not None
 
     def close(self):
-        self.storedfields.close()
-        self.termsindex.close()
-        if self.postfile:
-            self.postfile.close()
+        with _shared_readers_lock:
+            # If the reader is shared, only the last caller to close it
+            # actually closes the files
+            self._refs -= 1
+            if self._refs > 0:
+                return
+            key = (id(self.storage), id(self.segment))
+            if _shared_readers.get(key) is self:
+                del _shared_readers[key]
+
+        self._stored_cache.clear()
+        self._terminfo_cache.clear()
+        self._prefix_cache.clear()
+        self._postreader_pool.clear()
+        # Only close the files that were actually opened
+        opened = self.__dict__
+        if "storedfields" in opened:
+            self.storedfields.close()
+        if "termsindex" in opened:
+            self.termsindex.close()
+        with self._postfiles_lock:
+            for postfile in self._postfiles:
+                postfile.close()
+            del self._postfiles[:]
+            self._shared_postfile = None
         if self.vectorindex:
             self.vectorindex.close()
-        # if self.fieldlengths:
-        #    self.fieldlengths.close()
+        if self.vpostfile is not None:
+            self.vpostfile.close()
+        if opened.get("_fieldlengths_map") is not None:
+            self.fieldlengths.release()
+            try:
+                self._fieldlengths_map.close()
+            except BufferError:
+                # A view from field_lengths_view() is still alive, so leave
+                # the map to be closed when the last reference goes away
+                del self._fieldlengths_map
         self.is_closed = True
 
     def doc_count_all(self):
         return self.dc
 
-    @protected
-    def stored_fields(self, docnum):
-        return self.storedfields[docnum]
+    def _stored_row(self, docnum):
+        # Scoring, highlighting and result display often ask for the same
+        # document more than once, so keep recently decoded documents in a
+        # small LRU cache. The rows are immutable so they can be handed out
+        # without copying
+        cache = self._stored_cache
+        try:
+            row = cache[docnum]
+            cache.move_to_end(docnum)
+        except KeyError:
+            # The stored fields file is read by seeking, so misses have to
+            # take the lock
+            with self._sync_lock:
+                fields = self.storedfields[docnum]
+            row = self._stored_row_type._make(map(fields.get, self._stored_names))
+            limit = self.stored_cache_max_value
+            if not any(type(v) in (str, bytes) and len(v) > limit for v in row):
+                cache[docnum] = row
+                if len(cache) > self.stored_cache_size:
+                    cache.popitem(last=False)
+        return row
+
+    # Reads don't lock the whole reader: the accessors only take _sync_lock
+    # around reads from a file that has to be seeked
+
+    def stored_fields(self, docnum, names=None):
+        """Returns a dictionary of the stored fields of the given document.
+
+        :param names: an optional sequence of stored field names. If given,
+            only these fields are included in the dictionary, which saves
+            building entries the caller is going to ignore.
+        """
+
+        row = self._stored_row(docnum)
+        if names is None:
+            return dict(zip(self._stored_names, row))
+        positions = self._stored_positions
+        return {name: row[positions[name]] for name in names}
+
+    def stored_fields_view(self, docnum):
+        """Returns a read-only mapping of the stored fields of the given
+        document. Unlike :meth:`stored_fields`, this doesn't build a new
+        dictionary: lookups go straight to the reader's cached copy of the
+        document, so it's cheaper when the caller reads a few fields once
+        (for example to display a result) and throws the mapping away.
+        """
+
+        return _StoredFieldsView(self._stored_positions, self._stored_row(docnum))
+
+    def stored_row(self, docnum):
+        """Returns the stored fields of the given document as a named tuple
+        with one item per stored field in the schema, in schema order. This
+        is cheaper than :meth:`stored_fields` when the caller only needs to
+        read a few fields by attribute.
+        """
+
+        return self._stored_row(docnum)
 
-    @protected
     def all_stored_fields(self):
-        is_deleted = self.segment.is_deleted
-        for docnum in range(self.segment.doc_count_all()):
-            if not is_deleted(docnum):
-                yield self.storedfields[docnum]
+        storedfields = self.storedfields
+        deleted = self.segment.deleted
+        # The whole file is about to be read in order, so let the OS read
+        # ahead aggressively until the iteration is finished or abandoned
+        storedfile = self._storedfile
+        _advise_sequential(storedfile)
+        try:
+            # Skip the deleted documents with a filter over the set's
+            # __contains__, instead of calling is_deleted() for every document
+            docnums = iter(range(self.dc))
+            if deleted:
+                docnums = filterfalse(deleted.__contains__, docnums)
+            # The records are read in document order, so each read starts
+            # where the last one ended. They're read in batches under the lock
+            # and yielded after it's released, so the caller can use the
+            # reader's other methods between documents
+            sync_lock = self._sync_lock
+            while True:
+                with sync_lock:
+                    batch = list(
+                        map(storedfields.__getitem__, islice(docnums, _STORED_BATCH))
+                    )
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            if not self.is_closed:
+                _advise_sequential(storedfile, False)
 
     def field_length(self, fieldnum):
         return self.segment.field_length(fieldnum)
 
-    @protected
     def doc_field_length(self, docnum, fieldnum, default=0):
-        index = self.indices[fieldnum]
-        pos = index * self.dc + docnum
-        return byte_to_length(self.fieldlengths[pos])
+        # The base offsets are precomputed, so this is two lookups and an
+        # add. Fields that aren't scorable have no lengths stored
+        try:
+            base = self._length_bases[fieldnum]
+        except KeyError:
+            return default
+        return _BYTE_LENGTHS[self.fieldlengths[base + docnum]]
+
+    def doc_field_lengths(self, docnums, fieldnum):
+        """Returns a list of the lengths of the given field in each of the
+        given documents. This does the offset arithmetic once for the whole
+        batch instead of once per document, which is useful when scoring a
+        block of postings at a time.
+        """
+
+        base = self._length_bases[fieldnum]
+        fieldlengths = self.fieldlengths
+        lengths = _BYTE_LENGTHS
+        return [lengths[fieldlengths[base + docnum]] for docnum in docnums]
+
+    def doc_lengths(self, docnum):
+        """Returns a dictionary mapping the number of each scorable field to
+        its length in the given document. This reads from a copy of the field
+        lengths transposed into document order (built the first time it's
+        needed), so it's cheaper than calling :meth:`doc_field_length` for
+        each field when scoring a document across several fields.
+        """
+
+        n = len(self.indices)
+        row = self._doc_major_lengths[docnum * n : docnum * n + n]
+        return dict(zip(self.indices, map(_BYTE_LENGTHS.__getitem__, row)))
+
+    def all_doc_field_lengths(self, fieldnum):
+        """Returns a list of the lengths of the given field in every document
+        in the segment (including deleted documents), indexed by document
+        number. Decoding the whole field at once iterates over the field's
+        run of length bytes instead of indexing into them, which is several
+        times faster per document than :meth:`doc_field_length`, so scorers
+        that need the lengths of most documents can look them up in the list.
+        """
+
+        lengths = _BYTE_LENGTHS
+        with self.field_lengths_view(fieldnum) as view:
+            return [lengths[b] for b in view]
+
+    def field_lengths_view(self, fieldnum):
+        """Returns a read-only memoryview of the encoded length bytes of the
+        given field, indexed by document number. This lets a scorer work
+        through the lengths of one field as a contiguous run instead of
+        calling :meth:`doc_field_length` per document. Decode the bytes with
+        :func:`whoosh.util.numeric.byte_to_length`.
+        """
+
+        base = self._length_bases[fieldnum]
+        return memoryview(self.fieldlengths)[base : base + self.dc].toreadonly()
 
     def max_field_length(self, fieldnum):
         return self.segment.max_field_length(fieldnum)
 
-    @protected
     def has_vector(self, docnum, fieldnum):
         self._open_vectors()
-        return (docnum, fieldnum) in self.vectorindex
+        # The vector index is read by seeking, so lookups take the lock
+        with self._sync_lock:
+            return (docnum, fieldnum) in self.vectorindex
 
-    @protected
     def __iter__(self):
-        for (fn, t), (totalfreq, _, postcount) in self.termsindex:
-            yield (fn, t, postcount, totalfreq)
+        return map(_term_row, self.termsindex)
 
-    @protected
     def iter_from(self, fieldnum, text):
-        tt = self.termsindex
-        for (fn, t), (totalfreq, _, postcount) in tt.items_from((fieldnum, text)):
-            yield (fn, t, postcount, totalfreq)
+        return map(_term_row, self.termsindex.items_from((fieldnum, text)))
 
-    @protected
     def _term_info(self, fieldnum, text):
+        info = self._term_info_or(fieldnum, text)
+        if info is None:
+            raise TermNotFound(f"{fieldnum}:{text!r}")
+        return info
+
+    def _term_info_or(self, fieldnum, text, default=None):
+        # Returns the term's info, or the default if it's not in the index,
+        # for callers that would only catch TermNotFound and carry on
+        key = (fieldnum, text)
+        cache = self._terminfo_cache
         try:
-            return self.termsindex[(fieldnum, text)]
+            info = cache[key]
+            cache.move_to_end(key)
         except KeyError:
-            raise TermNotFound(f"{fieldnum}:{text!r}")
+            try:
+                with self._sync_lock:
+                    info = self.termsindex[key]
+            except KeyError:
+                # Remember terms that aren't in the index too, so repeated
+                # queries for them (common with misspellings and phrase terms)
+                # don't probe the term index again
+                info = None
+            cache[key] = info
+            if len(cache) > self.terminfo_cache_size:
+                cache.popitem(last=False)
+        if info is None:
+            return default
+        return info
+
+    def _term_infos(self, keys):
+        # Returns a list of the infos of the given (fieldnum, text) keys, with
+        # None for terms that aren't in the index. The keys that aren't cached
+        # are all looked up under one acquisition of the lock, so a query with
+        # many terms doesn't contend for it once per term
+        cache = self._terminfo_cache
+        infos = [cache.get(key, cache) for key in keys]
+        missing = [key for key, info in zip(keys, infos) if info is cache]
+        if missing:
+            termsindex = self.termsindex
+            with self._sync_lock:
+                found = {key: termsindex.get(key) for key in missing}
+            for key, info in found.items():
+                cache[key] = info
+            while len(cache) > self.terminfo_cache_size:
+                cache.popitem(last=False)
+            infos = [
+                found[key] if info is cache else info for key, info in zip(keys, infos)
+            ]
+        return infos
 
     def doc_frequency(self, fieldid, text):
-        try:
-            fieldnum = self.schema.to_number(fieldid)
-            return self._term_info(fieldnum, text)[2]
-        except TermNotFound:
-            return 0
+        info = self._term_info_or(self._to_number(fieldid), text)
+        return info[2] if info else 0
 
     def frequency(self, fieldid, text):
-        try:
-            fieldnum = self.schema.to_number(fieldid)
-            return self._term_info(fieldnum, text)[0]
-        except TermNotFound:
-            return 0
+        info = self._term_info_or(self._to_number(fieldid), text)
+        return info[0] if info else 0
 
-    @protected
     def lexicon(self, fieldid):
         # The base class has a lexicon() implementation that uses iter_from()
         # and throws away the value, but overriding to use
         # FileTableReader.keys_from() is much, much faster.
 
-        tt = self.termsindex
-        fieldid = self.schema.to_number(fieldid)
-        for fn, t in tt.keys_from((fieldid, "")):
-            if fn != fieldid:
-                return
-            yield t
+        fieldnum = self._to_number(fieldid)
+        keys = self.termsindex.keys_from((fieldnum, ""))
+        stop = _prefix_stop(fieldnum, "")
+        return map(itemgetter(1), takewhile(stop.__gt__, keys))
 
-    @protected
     def expand_prefix(self, fieldid, prefix):
         # The base class has an expand_prefix() implementation that uses
         # iter_from() and throws away the value, but overriding to use
         # FileTableReader.keys_from() is much, much faster.
 
-        tt = self.termsindex
-        fieldid = self.schema.to_number(fieldid)
-        for fn, t in tt.keys_from((fieldid, prefix)):
-            if fn != fieldid or not t.startswith(prefix):
-                return
-            yield t
+        fieldnum = self._to_number(fieldid)
+        start = (fieldnum, prefix)
+        cache = self._prefix_cache
+        try:
+            texts = cache[start]
+            cache.move_to_end(start)
+            return iter(texts)
+        except KeyError:
+            pass
+
+        # Every key before the stop key is in the field and starts with the
+        # prefix, so a single tuple comparison per key ends the scan
+        keys = self.termsindex.keys_from(start)
+        stop = _prefix_stop(fieldnum, prefix)
+        texts = map(itemgetter(1), takewhile(stop.__gt__, keys))
+
+        # Remember short expansions, which is what autocompletion asks for
+        # over and over, but don't read long ones into memory
+        limit = self.prefix_cache_max_terms
+        first = tuple(islice(texts, limit + 1))
+        if len(first) > limit:
+            return chain(first, texts)
+        cache[start] = first
+        if len(cache) > self.prefix_cache_size:
+            cache.popitem(last=False)
+        return iter(first)
+
+    def term_infos(self, fieldid):
+        """Returns the terms in the given field and their info as four
+        parallel columns, in term order: a list of the term texts, and
+        ``array("I")`` arrays of the terms' total frequencies, postings
+        offsets, and document frequencies. This reads the field's part of the
+        term index in one sequential pass and stores the numbers compactly,
+        for callers (such as scorers precomputing term weights) that walk
+        every term in a field instead of looking terms up one at a time.
+        """
+
+        fieldnum = self._to_number(fieldid)
+        items = self.termsindex.items_from((fieldnum, ""))
+        stop = _prefix_stop(fieldnum, "")
+        texts = []
+        freqs = array("I")
+        offsets = array("I")
+        postcounts = array("I")
+        for (_, text), (totalfreq, offset, postcount) in takewhile(
+            lambda item: item[0] < stop, items
+        ):
+            texts.append(text)
+            freqs.append(totalfreq)
+            offsets.append(offset)
+            postcounts.append(postcount)
+        return texts, freqs, offsets, postcounts
 
     def postings(self, fieldid, text, exclude_docs=frozenset()):
         schema = self.schema
-        fieldnum = schema.to_number(fieldid)
+        fieldnum = self._to_number(fieldid)
         format = schema[fieldnum].format
 
         try:
-            offset = self.termsindex[(fieldnum, text)][1]
-        except KeyError:
+            offset = self._term_info(fieldnum, text)[1]
+        except TermNotFound:
             raise TermNotFound(f"{fieldid}:{text!r}")
 
-        if self.segment.deleted and exclude_docs:
-            exclude_docs = self.segment.deleted | exclude_docs
-        elif self.segment.deleted:
-            exclude_docs = self.segment.deleted
-
-        self._open_postfile()
-        postreader = FilePostingReader(self.postfile, offset, format)
+        deleted = self._deleted_docs
+        if deleted is not None:
+            if exclude_docs:
+                exclude_docs = deleted.union(exclude_docs)
+            else:
+                exclude_docs = deleted
+
+        # Reuse a posting reader that a previous caller closed, if there is
+        # one, instead of building a new object for every term
+        postfile = self._open_postfile()
+        pool = self._postreader_pool
+        try:
+            postreader = pool.pop()
+        except IndexError:
+            postreader = FilePostingReader(postfile, offset, format)
+        else:
+            postreader.reset(postfile, offset, format)
+        postreader.onclose = pool.append
         # if exclude_docs:
         #    postreader = Exclude(postreader, exclude_docs)
         return postreader
 
+    def postings_batch(self, terms):
+        """Returns a list of posting readers for the given sequence of
+        ``(fieldid, text)`` pairs, in the same order. This looks up all the
+        terms first and asks the OS to read the start of every posting list
+        ahead, in file order, so the reads for a multi-term query overlap
+        instead of happening one term at a time.
+
+        :raises TermNotFound: if any of the terms isn't in the segment.
+        """
+
+        terms = list(terms)
+        keys = [(self._to_number(fieldid), text) for fieldid, text in terms]
+        infos = self._term_infos(keys)
+        for (fieldid, text), info in zip(terms, infos):
+            if info is None:
+                raise TermNotFound(f"{fieldid}:{text!r}")
+
+        if len(infos) > 1:
+            offsets = sorted(info[1] for info in infos)
+            _will_need(self._open_postfile(), offsets, self.postings_readahead)
+        return [self.postings(fieldnum, text) for fieldnum, text in keys]
+
+    def score_term(self, fieldid, text, scorefn):
+        """Returns a list of ``(docnum, score)`` pairs for the documents
+        containing the given term, where each score is
+        ``scorefn(weight, length)``: the term's weight in the document and the
+        length of the field in the document. Deleted documents are skipped.
+
+        This works through the postings a block at a time, looking up the
+        field lengths and calling the scoring function for the whole block at
+        once, instead of going through the matcher's ``id()``, ``weight()``,
+        and ``next()`` and :meth:`doc_field_length` for every posting.
+        """
+
+        fieldnum = self._to_number(fieldid)
+        base = self._length_bases[fieldnum]
+        fieldlengths = self.fieldlengths
+        lengths = _BYTE_LENGTHS
+        deleted = self._deleted_docs
+
+        scores = []
+        with self.postings(fieldnum, text) as postreader:
+            while postreader.is_active():
+                ids = postreader.block_ids()
+                blocklengths = [lengths[fieldlengths[base + docnum]] for docnum in ids]
+                blockscores = zip(
+                    ids, map(scorefn, postreader.block_weights(), blocklengths)
+                )
+                if deleted is None:
+                    scores.extend(blockscores)
+                else:
+                    scores.extend(s for s in blockscores if s[0] not in deleted)
+                postreader.next_block()
+        return scores
+
     def vector(self, docnum, fieldid):
         schema = self.schema
-        fieldnum = schema.to_number(fieldid)
+        fieldnum = self._to_number(fieldid)
         vformat = schema[fieldnum].vector
         if not vformat:
             raise Exception(f"No vectors are stored for field {fieldid!r}")
 
         self._open_vectors()
-        offset = self.vectorindex.get((docnum, fieldnum))
+        with self._sync_lock:
+            offset = self.vectorindex.get((docnum, fieldnum))
         if offset is None:
             raise Exception(f"No vector found for document {docnum} field {fieldid!r}")
 
         return FilePostingReader(self.vpostfile, offset, vformat, stringids=True)
+
+    def vectors_batch(self, docnums, fieldid):
+        """Returns a dictionary mapping each of the given document numbers to
+        a reader for the document's term vector in the given field. Documents
+        without a vector for the field are left out. This looks up all the
+        vectors first and asks the OS to read them ahead, in file order, so
+        the reads overlap instead of happening one document at a time, which
+        helps highlighting and "more like this" over many results.
+        """
+
+        schema = self.schema
+        fieldnum = self._to_number(fieldid)
+        vformat = schema[fieldnum].vector
+        if not vformat:
+            raise Exception(f"No vectors are stored for field {fieldid!r}")
+
+        self._open_vectors()
+        vectorindex = self.vectorindex
+        docnums = sorted(set(docnums))
+        with self._sync_lock:
+            offsets = [vectorindex.get((docnum, fieldnum)) for docnum in docnums]
+        found = [(d, o) for d, o in zip(docnums, offsets) if o is not None]
+
+        vpostfile = self.vpostfile
+        if len(found) > 1:
+            _will_need(vpostfile, sorted(o for _, o in found), self.vectors_readahead)
+        return {
+            docnum: FilePostingReader(vpostfile, offset, vformat, stringids=True)
+            for docnum, offset in found
+        }
@@ -26,36 +26,116 @@
 # policies, either expressed or implied, of Matt Chaput.
 
 
+import atexit
 import errno
 import os
 import sys
 import tempfile
+import time
 from io import BytesIO
+from itertools import count
+from shutil import rmtree
 from threading import Lock
 
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
 from whoosh.filedb.structfile import BufferFile, StructFile
-from whoosh.index import _DEF_INDEX_NAME, EmptyIndexError
+from whoosh.index import _DEF_INDEX_NAME, EmptyIndexError, FileIndex
 from whoosh.util import random_name
 from whoosh.util.filelock import FileLock
 
 
 def memoryview_(source, offset=None, length=None):
-    mv = memoryview(source)
-    if offset or length:
-        return mv[offset : offset + length]
-    else:
+    """Returns a memoryview of ``length`` bytes of the given buffer starting at
+    ``offset``. The offset defaults to the start of the buffer and the length
+    to the rest of the buffer. A memoryview source without an offset or
+    length is returned as is instead of being wrapped in another view.
+    """
+
+    mv = source if isinstance(source, memoryview) else memoryview(source)
+    if offset is None and length is None:
         return mv
+    offset = offset or 0
+    if length is None:
+        return mv[offset:]
+    return mv[offset : offset + length]
+
+
+# Directory that holds the temporary storages made by RamStorage.temp_storage()
+# in this process, created on first use. Keeping one private root (instead of
+# putting each storage straight in the shared temp directory under a random
+# name) means a new storage only costs one mkdir of a counter-named directory.
+# The root is keyed on the process ID so a forked child doesn't reuse its
+# parent's directory and counter
+_temp_root = None
+_temp_lock = Lock()
+
+
+def _temp_dir():
+    global _temp_root
+
+    with _temp_lock:
+        pid = os.getpid()
+        if _temp_root is None or _temp_root[0] != pid:
+            path = tempfile.mkdtemp(prefix="whoosh_")
+            atexit.register(_remove_temp_root, pid, path)
+            _temp_root = (pid, path, count())
+        return _temp_root[1], _temp_root[2]
+
+
+def _remove_temp_root(pid, path):
+    # atexit handlers are inherited across fork, so only the process that
+    # made the directory removes it
+    if os.getpid() == pid:
+        rmtree(path, ignore_errors=True)
+
+
+def _close_mapped(bufferfile):
+    # Releases the file's view of its map before closing the map. If views of
+    # part of the file are still alive, the map is left for them to keep open
+    bufferfile.file.close()
+    try:
+        bufferfile._buf.close()
+    except BufferError:
+        pass
+
+
+# Maps the access hints accepted by FileStorage.open_file() to fadvise advice
+if hasattr(os, "posix_fadvise"):
+    _FADVICE = {
+        "sequential": os.POSIX_FADV_SEQUENTIAL,
+        "random": os.POSIX_FADV_RANDOM,
+        "willneed": os.POSIX_FADV_WILLNEED,
+    }
+else:
+    _FADVICE = {}
+
+# Path separators to look for in file names (Windows accepts both)
+_SEP = os.sep
+_ALTSEP = os.altsep or os.sep
+
+
+# Coarsest file modification time resolution of common filesystems (FAT
+# keeps times to two seconds)
+_MTIME_RESOLUTION_NS = 2 * 10**9
 
 
 # Exceptions
 
 
+# These deliberately don't inherit from OSError: index cleanup and the TOC
+# retry loop catch OSError to skip files another process is using, and would
+# otherwise silently swallow an attempt to modify a read-only storage or to
+# use a closed one
 class StorageError(Exception):
-    pass
+    """Raised when a storage object can't carry out an operation."""
 
 
 class ReadOnlyError(StorageError):
-    pass
+    """Raised when you try to modify a storage object opened as read-only."""
 
 
 # Base class
@@ -87,6 +167,9 @@ class Storage:
     avoid putting implementation-specific setup code in your application.
     """
 
+    # Subclasses that don't declare slots still get a __dict__ as usual
+    __slots__ = ()
+
     readonly = False
     supports_mmap = False
 
@@ -158,9 +241,7 @@ class Storage:
         if self.readonly:
             raise ReadOnlyError
         if indexclass is None:
-            import whoosh.index
-
-            indexclass = whoosh.index.FileIndex
+            indexclass = FileIndex
         return indexclass.create(self, schema, indexname)
 
     def open_index(self, indexname=_DEF_INDEX_NAME, schema=None, indexclass=None):
@@ -185,9 +266,7 @@ class Storage:
         """
 
         if indexclass is None:
-            import whoosh.index
-
-            indexclass = whoosh.index.FileIndex
+            indexclass = FileIndex
         return indexclass(self, schema=schema, indexname=indexname)
 
     def index_exists(self, indexname=None):
@@ -212,6 +291,11 @@ class Storage:
     def create_file(self, name):
         """Creates a file with the given name in this storage.
 
+        The returned file's ``write()`` method accepts any bytes-like object
+        (such as ``bytes``, ``bytearray``, ``memoryview``, or an ``array``),
+        so there's no need to copy a buffer into a ``bytes`` object before
+        writing it.
+
         :param name: the name for the new file.
         :return: a :class:`whoosh.filedb.structfile.StructFile` instance.
         """
@@ -221,12 +305,46 @@ class Storage:
     def open_file(self, name, *args, **kwargs):
         """Opens a file with the given name in this storage.
 
+        Implementations should accept a ``hint`` keyword argument describing
+        how the caller will read the file (``"sequential"``, ``"random"`` or
+        ``"willneed"``), and are free to ignore it.
+
         :param name: the name for the new file.
         :return: a :class:`whoosh.filedb.structfile.StructFile` instance.
         """
 
         raise NotImplementedError
 
+    def open_buffer(self, name):
+        """Returns the contents of the given file as a read-only memoryview,
+        for callers that decode the file in place (for example with
+        ``struct.unpack_from``) and don't need a file object. Storage
+        implementations can override this to return a view of a memory map
+        or of data they already hold in memory instead of a copy. The
+        default implementation reads the whole file.
+
+        :param name: the name of the file to open.
+        :rtype: memoryview
+        """
+
+        with self.open_file(name) as f:
+            return memoryview(f.read())
+
+    def open_files(self, names, **kwargs):
+        """Opens several existing files in this storage at once. The default
+        implementation just calls :meth:`open_file` for each name, but
+        storage implementations can override it to start reading the files
+        in parallel.
+
+        :param names: a sequence of file names to open.
+        :param kwargs: additional keyword arguments are passed to
+            :meth:`open_file`.
+        :return: a list of :class:`whoosh.filedb.structfile.StructFile`
+            instances, in the same order as the names.
+        """
+
+        return [self.open_file(name, **kwargs) for name in names]
+
     def list(self):
         """Returns a list of file names in this storage.
 
@@ -262,6 +380,32 @@ class Storage:
 
         raise NotImplementedError
 
+    def file_stats(self, names=None):
+        """Returns a dictionary mapping file names to ``(length, modified)``
+        tuples of the files' sizes in bytes and last-modified times, as
+        returned by :meth:`file_length` and :meth:`file_modified`.
+        Implementations can override this to get both for each file at once.
+
+        :param names: the names of the files to include. The default is all
+            the files in this storage.
+        :rtype: dict
+        """
+
+        if names is None:
+            names = self.list()
+        return {
+            name: (self.file_length(name), self.file_modified(name)) for name in names
+        }
+
+    def prefetch_metadata(self):
+        """Gives the storage a chance to read information about all of its
+        files at once, before a caller asks about them one at a time (for
+        example when an index is opened). The default implementation does
+        nothing.
+        """
+
+        pass
+
     def delete_file(self, name):
         """Removes the given file from this storage.
 
@@ -330,44 +474,100 @@ class OverlayStorage(Storage):
     has the named file, otherwise the second. Writes always go to the second.
     """
 
+    # Segment readers create one of these for every compound segment they
+    # open, so don't give each one a __dict__
+    __slots__ = ("a", "b", "_list_cache")
+
     def __init__(self, a, b):
         self.a = a
         self.b = b
+        # The combined list of names, kept until a file is created or deleted
+        # through the overlay or prefetch_metadata() is called. Files added to
+        # or removed from either storage directly (not through the overlay)
+        # won't show up in list() until then
+        self._list_cache = None
+
+    def _changed(self, sfile=None):
+        self._list_cache = None
 
     def create_index(self, *args, **kwargs):
-        self.b.create_index(*args, **kwargs)
+        self._changed()
+        return self.b.create_index(*args, **kwargs)
 
     def open_index(self, *args, **kwargs):
-        self.a.open_index(*args, **kwargs)
+        return self.a.open_index(*args, **kwargs)
 
     def create_file(self, *args, **kwargs):
-        return self.b.create_file(*args, **kwargs)
+        self._changed()
+        f = self.b.create_file(*args, **kwargs)
+        # Some storages (such as RamStorage) only add the file when it's
+        # closed, so forget the list again then
+        onclose = f.onclose
+
+        def onclose_fn(sfile):
+            if onclose:
+                onclose(sfile)
+            self._changed()
+
+        f.onclose = onclose_fn
+        return f
 
     def open_file(self, name, *args, **kwargs):
-        if self.a.file_exists(name):
+        # Just try to open the file instead of checking that it exists first,
+        # which saves a stat() call and can't race with the file being
+        # removed from the first storage (RamStorage and CompoundStorage raise
+        # NameError for a missing file)
+        try:
             return self.a.open_file(name, *args, **kwargs)
-        else:
+        except (FileNotFoundError, NameError):
             return self.b.open_file(name, *args, **kwargs)
 
+    def open_buffer(self, name):
+        try:
+            return self.a.open_buffer(name)
+        except (FileNotFoundError, NameError):
+            return self.b.open_buffer(name)
+
+    def prefetch_metadata(self):
+        for storage in (self.a, self.b):
+            prefetch = getattr(storage, "prefetch_metadata", None)
+            if prefetch is not None:
+                prefetch()
+        self._changed()
+
+    def _names(self):
+        # The union of the two sets of names is only worked out again after
+        # a change, and kept as a tuple so iterating it doesn't need a copy
+        names = self._list_cache
+        if names is None:
+            names = tuple(sorted(set(self.a.list()).union(self.b.list())))
+            self._list_cache = names
+        return names
+
+    def __iter__(self):
+        return iter(self._names())
+
     def list(self):
-        return list(set(self.a.list()) | set(self.b.list()))
+        return list(self._names())
 
     def file_exists(self, name):
         return self.a.file_exists(name) or self.b.file_exists(name)
 
     def file_modified(self, name):
+        # Unlike open_file(), these have to check first: not every storage
+        # raises NameError for a missing file here (RamStorage returns -1 from
+        # file_modified() for any name)
         if self.a.file_exists(name):
             return self.a.file_modified(name)
-        else:
-            return self.b.file_modified(name)
+        return self.b.file_modified(name)
 
     def file_length(self, name):
         if self.a.file_exists(name):
             return self.a.file_length(name)
-        else:
-            return self.b.file_length(name)
+        return self.b.file_length(name)
 
     def delete_file(self, name):
+        self._changed()
         return self.b.delete_file(name)
 
     def rename_file(self, *args, **kwargs):
@@ -398,8 +598,13 @@ class FileStorage(Storage):
     """
 
     supports_mmap = True
+    # Only set on instances created with cache_stats=True
+    _stat_cache = None
+    _list_cache = None
 
-    def __init__(self, path, supports_mmap=True, readonly=False, debug=False):
+    def __init__(
+        self, path, supports_mmap=True, readonly=False, debug=False, cache_stats=False
+    ):
         """
         :param path: a path to a directory.
         :param supports_mmap: if True (the default), use the ``mmap`` module to
@@ -408,13 +613,29 @@ class FileStorage(Storage):
             instead of with ``mmap``.
         :param readonly: If ``True``, the object will raise an exception if you
             attempt to create or rename a file.
+        :param cache_stats: if True, remember the directory listing and the
+            result of each file's ``stat()`` call, so :meth:`list`,
+            :meth:`file_exists`, :meth:`file_length` and
+            :meth:`file_modified` only ask the OS once per file. The cache is
+            updated when this object changes a file, but not when another
+            object or process does, so only use this when nothing else writes
+            to the directory (or call :meth:`clear_stat_cache` when it might
+            have).
         """
 
         self.folder = path
+        # os.path.abspath() calls os.getcwd() for a relative path, so work out
+        # the absolute folder once instead of for every file name
+        self._folder_prefix = os.path.join(os.path.abspath(path), "")
         self.supports_mmap = supports_mmap
         self.readonly = readonly
         self._debug = debug
         self.locks = {}
+        # Maps index names to (directory mtime, result) for index_exists()
+        self._exists_cache = {}
+        if cache_stats:
+            # Maps file names to stat results, or None for a missing file
+            self._stat_cache = {}
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self.folder!r})"
@@ -481,6 +702,29 @@ class FileStorage(Storage):
             else:
                 raise e
 
+    def index_exists(self, indexname=None):
+        # Checking for an index means opening it and reading its TOC. Every
+        # commit adds and removes files in the directory, which changes the
+        # directory's mtime, so an answer is reused for as long as the mtime
+        # stays the same
+        if indexname is None:
+            indexname = _DEF_INDEX_NAME
+        try:
+            mtime = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            return Storage.index_exists(self, indexname)
+
+        cached = self._exists_cache.get(indexname)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        result = Storage.index_exists(self, indexname)
+        # Some filesystems only keep mtimes to the second or two, so only
+        # trust an mtime that's old enough that another change would have
+        # given the directory a different one
+        if time.time_ns() - mtime > _MTIME_RESOLUTION_NS:
+            self._exists_cache[indexname] = (mtime, result)
+        return result
+
     def create_file(self, name, excl=False, mode="wb", **kwargs):
         """Creates a file with the given name in this storage.
 
@@ -505,29 +749,206 @@ class FileStorage(Storage):
             fileobj = open(path, mode)
 
         f = StructFile(fileobj, name=name, **kwargs)
+        if self._stat_cache is not None:
+            self._forget(name)
+            # The size and time keep changing until the file is closed
+            onclose = f.onclose
+
+            def onclose_fn(sfile):
+                if onclose:
+                    onclose(sfile)
+                self._forget(name)
+
+            f.onclose = onclose_fn
         return f
 
-    def open_file(self, name, **kwargs):
+    def open_file(self, name, hint=None, **kwargs):
         """Opens an existing file in this storage.
 
         :param name: the name of the file to open.
+        :param hint: how the file will be read: ``"sequential"`` (from start
+            to end, so the OS can read further ahead), ``"random"`` (so it
+            doesn't read ahead) or ``"willneed"`` (start reading the whole
+            file into the cache now). Where the platform supports
+            ``posix_fadvise``, this is passed on to the OS; otherwise it's
+            ignored.
         :param kwargs: additional keyword arguments are passed through to the
             :class:`~whoosh.filedb.structfile.StructFile` initializer.
         :return: a :class:`whoosh.filedb.structfile.StructFile` instance.
         """
 
-        f = StructFile(open(self._fpath(name), "rb"), name=name, **kwargs)
+        fileobj = open(self._fpath(name), "rb")
+        if hint is not None:
+            if hint not in ("sequential", "random", "willneed"):
+                fileobj.close()
+                raise ValueError(f"Unknown access hint {hint!r}")
+            if hint in _FADVICE:
+                try:
+                    os.posix_fadvise(fileobj.fileno(), 0, 0, _FADVICE[hint])
+                except OSError:
+                    # The advice is only a hint, and some files (such as
+                    # pipes) don't accept it
+                    pass
+        f = StructFile(fileobj, name=name, **kwargs)
         return f
 
+    def open_buffer(self, name):
+        with open(self._fpath(name), "rb") as fileobj:
+            if mmap and self.supports_mmap:
+                try:
+                    buf = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    # Empty files can't be mapped
+                    return memoryview(b"")
+                # The map is closed when the last view of it is released
+                return memoryview(buf)
+            return memoryview(fileobj.read())
+
+    def open_files(self, names, **kwargs):
+        """Opens several existing files in this storage at once. After
+        opening the files, this asks the OS to start reading all of them into
+        its cache (where the platform supports ``posix_fadvise``), so the
+        reads of the different files overlap instead of each waiting for the
+        last.
+
+        :param names: a sequence of file names to open.
+        :param kwargs: additional keyword arguments are passed through to the
+            :class:`~whoosh.filedb.structfile.StructFile` initializer.
+        :return: a list of :class:`whoosh.filedb.structfile.StructFile`
+            instances, in the same order as the names.
+        """
+
+        files = []
+        try:
+            # The "willneed" hint makes open_file() ask the OS to start
+            # reading each file as soon as it's open. extend() keeps the files
+            # opened before a failure, so they can be closed
+            files.extend(
+                self.open_file(name, hint="willneed", **kwargs) for name in names
+            )
+        except Exception:
+            for f in files:
+                f.close()
+            raise
+        return files
+
+    def open_files_mmap(self, names):
+        """Opens several existing files in this storage as memory maps, and
+        returns them as :class:`~whoosh.filedb.structfile.BufferFile` objects
+        that read straight from the maps. Where the platform supports it, the
+        maps are populated up front, so the pages are read in (in parallel by
+        the OS) and mapped before the first read instead of faulting in one
+        at a time. If the storage doesn't support mmap, the files are opened
+        normally with :meth:`open_files`.
+
+        :param names: a sequence of file names to open.
+        :return: a list of file objects, in the same order as the names.
+        """
+
+        if not (mmap and self.supports_mmap):
+            return self.open_files(names)
+
+        if hasattr(mmap, "MAP_PRIVATE"):
+            mapargs = {
+                "flags": mmap.MAP_PRIVATE | getattr(mmap, "MAP_POPULATE", 0),
+                "prot": mmap.PROT_READ,
+            }
+        else:
+            # Windows
+            mapargs = {"access": mmap.ACCESS_READ}
+
+        files = []
+        try:
+            for name in names:
+                with open(self._fpath(name), "rb") as fileobj:
+                    try:
+                        buf = mmap.mmap(fileobj.fileno(), 0, **mapargs)
+                    except ValueError:
+                        # Empty files can't be mapped
+                        files.append(BufferFile(b"", name=name))
+                        continue
+                files.append(BufferFile(buf, name=name, onclose=_close_mapped))
+        except Exception:
+            for f in files:
+                f.close()
+            raise
+        return files
+
     def _fpath(self, fname):
+        # Paths are kept as str: the os functions encode a str path in C,
+        # which is cheaper than encoding the name to bytes in Python first.
+        # A plain file name can just be added to the folder; anything that
+        # could point somewhere else (a separator, "." or "..") is joined and
+        # normalized the long way
+        if _SEP not in fname and _ALTSEP not in fname and fname.strip("."):
+            return self._folder_prefix + fname
         return os.path.abspath(os.path.join(self.folder, fname))
 
+    def _stat(self, name):
+        # Returns the file's stat result, or raises FileNotFoundError
+        cache = self._stat_cache
+        if cache is None:
+            return os.stat(self._fpath(name))
+        try:
+            st = cache[name]
+        except KeyError:
+            try:
+                st = os.stat(self._fpath(name))
+            except FileNotFoundError:
+                st = None
+            cache[name] = st
+        if st is None:
+            raise FileNotFoundError(errno.ENOENT, "No such file", self._fpath(name))
+        return st
+
+    def _forget(self, name):
+        # Called when this object changes a file, to drop what the stat cache
+        # knows about it
+        if self._stat_cache is not None:
+            self._stat_cache.pop(name, None)
+            self._list_cache = None
+
+    def prefetch_metadata(self):
+        # Fill the stat cache (if there is one) from a single scan of the
+        # directory instead of one stat() call per file as they're asked for.
+        # This replaces what was cached, so it also picks up any changes
+        # made by other processes
+        cache = self._stat_cache
+        if cache is None:
+            return
+
+        cache.clear()
+        names = []
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    try:
+                        cache[entry.name] = entry.stat()
+                    except FileNotFoundError:
+                        # Deleted since the directory was read
+                        continue
+                    names.append(entry.name)
+        except OSError:
+            pass
+        self._list_cache = tuple(names)
+
+    def clear_stat_cache(self):
+        """Forgets any file information remembered because this object was
+        created with ``cache_stats=True``. Call this if another object or
+        process may have changed the files in the directory.
+        """
+
+        if self._stat_cache is not None:
+            self._stat_cache.clear()
+            self._list_cache = None
+
     def clean(self, ignore=False):
         if self.readonly:
             raise ReadOnlyError
 
         path = self.folder
         files = self.list()
+        self.clear_stat_cache()
         for fname in files:
             try:
                 os.remove(os.path.join(path, fname))
@@ -535,7 +956,27 @@ class FileStorage(Storage):
                 if not ignore:
                     raise
 
+    def __iter__(self):
+        if self._list_cache is not None:
+            yield from self._list_cache
+            return
+
+        # Yield the names as the directory is read instead of building the
+        # whole list first, so a caller looking for one name can stop early
+        try:
+            entries = os.scandir(self.folder)
+        except OSError:
+            return
+        with entries:
+            for entry in entries:
+                yield entry.name
+
     def list(self):
+        if self._stat_cache is not None:
+            if self._list_cache is None:
+                self.prefetch_metadata()
+            return list(self._list_cache)
+
         try:
             files = os.listdir(self.folder)
         except OSError:
@@ -543,31 +984,65 @@ class FileStorage(Storage):
 
         return files
 
+    def file_stats(self, names=None):
+        # One stat() call per file gets both the size and the time, instead
+        # of one call for each
+        if names is not None:
+            stats = {}
+            for name in names:
+                st = self._stat(name)
+                stats[name] = (st.st_size, st.st_mtime)
+            return stats
+
+        # For every file, read the entries from one scan of the directory
+        # instead of building each file's path
+        stats = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        # Deleted since the directory was read
+                        continue
+                    stats[entry.name] = (st.st_size, st.st_mtime)
+        except OSError:
+            pass
+        return stats
+
     def file_exists(self, name):
-        return os.path.exists(self._fpath(name))
+        # The three file methods share one stat() call when results are cached
+        try:
+            self._stat(name)
+        except (OSError, ValueError):
+            return False
+        return True
 
     def file_modified(self, name):
-        return os.path.getmtime(self._fpath(name))
+        return self._stat(name).st_mtime
 
     def file_length(self, name):
-        return os.path.getsize(self._fpath(name))
+        return self._stat(name).st_size
 
     def delete_file(self, name):
         if self.readonly:
             raise ReadOnlyError
 
+        self._forget(name)
         os.remove(self._fpath(name))
 
     def rename_file(self, oldname, newname, safe=False):
         if self.readonly:
             raise ReadOnlyError
 
-        if os.path.exists(self._fpath(newname)):
-            if safe:
-                raise NameError(f"File {newname!r} exists")
-            else:
-                os.remove(self._fpath(newname))
-        os.rename(self._fpath(oldname), self._fpath(newname))
+        newpath = self._fpath(newname)
+        if safe and os.path.exists(newpath):
+            raise NameError(f"File {newname!r} exists")
+        # os.replace() overwrites an existing file atomically on every
+        # platform, so there's no need to check for and remove it first
+        self._forget(oldname)
+        self._forget(newname)
+        os.replace(self._fpath(oldname), newpath)
 
     def lock(self, name):
         return FileLock(self._fpath(name))
@@ -613,6 +1088,17 @@ class RamStorage(Storage):
     def file_modified(self, name):
         return -1
 
+    def file_stats(self, names=None):
+        files = self.files
+        if names is None:
+            names = files
+        stats = {}
+        for name in names:
+            if name not in files:
+                raise NameError(name)
+            stats[name] = (len(files[name]), -1)
+        return stats
+
     def delete_file(self, name):
         if name not in self.files:
             raise NameError(name)
@@ -635,30 +1121,64 @@ class RamStorage(Storage):
         f = StructFile(BytesIO(), name=name, onclose=onclose_fn)
         return f
 
-    def open_file(self, name, **kwargs):
+    def open_file(self, name, hint=None, **kwargs):
+        # The file is already in memory, so there's nothing to do with a hint
         if name not in self.files:
             raise NameError(name)
         buf = memoryview_(self.files[name])
         return BufferFile(buf, name=name, **kwargs)
 
+    def open_buffer(self, name):
+        if name not in self.files:
+            raise NameError(name)
+        return memoryview(self.files[name]).toreadonly()
+
     def lock(self, name):
-        if name not in self.locks:
-            self.locks[name] = Lock()
-        return self.locks[name]
+        # setdefault() is atomic, so two threads asking for a new name at the
+        # same time get the same lock
+        try:
+            return self.locks[name]
+        except KeyError:
+            return self.locks.setdefault(name, Lock())
 
     def temp_storage(self, name=None):
-        tdir = tempfile.gettempdir()
-        name = name or f"{random_name()}.tmp"
-        path = os.path.join(tdir, name)
-        tempstore = FileStorage(path)
-        return tempstore.create()
+        tdir, counter = _temp_dir()
+        if name:
+            return FileStorage(os.path.join(tdir, name)).create()
+        # A numbered name is unique within this process's private directory,
+        # so there's no need to check for an existing directory first
+        path = os.path.join(tdir, f"{next(counter)}.tmp")
+        os.mkdir(path)
+        return FileStorage(path)
+
+
+def _on_disk(store):
+    # True if the storage's files are plain files under its folder (and not,
+    # for example, parts of a compound file)
+    cls = type(store)
+    return (
+        isinstance(store, FileStorage)
+        and cls.open_file is FileStorage.open_file
+        and cls.create_file is FileStorage.create_file
+    )
 
 
 def copy_storage(sourcestore, deststore):
     """Copies the files from the source storage object to the destination
-    storage object using ``shutil.copyfileobj``.
+    storage object using ``shutil.copyfileobj``. If both storage objects keep
+    their files on disk, the files are copied with ``shutil.copyfile``
+    instead, which lets the OS copy the data without reading it into Python
+    (using ``sendfile`` on Linux and ``fcopyfile`` on macOS).
     """
-    from shutil import copyfileobj
+    from shutil import copyfile, copyfileobj
+
+    if _on_disk(sourcestore) and _on_disk(deststore):
+        if deststore.readonly:
+            raise ReadOnlyError
+        for name in sourcestore.list():
+            deststore._forget(name)
+            copyfile(sourcestore._fpath(name), deststore._fpath(name))
+        return
 
     for name in sourcestore.list():
         with sourcestore.open_file(name) as source:
@@ -15,7 +15,6 @@
 # ===============================================================================
 
 from collections import defaultdict
-from marshal import dumps
 
 from whoosh.fields import UnknownFieldError
 from whoosh.filedb import misc
@@ -106,11 +105,6 @@ class SegmentWriter(SegmentDeletionMixin, IndexWriter):
         self.docnum = 0
         self.fieldlength_totals = defaultdict(int)
 
-        storedfieldnames = ix.schema.stored_field_names()
-
-        def encode_storedfields(fielddict):
-            return dumps([fielddict.get(k) for k in storedfieldnames])
-
         storage = ix.storage
 
         # Terms index
@@ -137,7 +131,9 @@ class SegmentWriter(SegmentDeletionMixin, IndexWriter):
 
         # Stored fields file
         sf = storage.create_file(segment.storedfields_filename)
-        self.storedfields = FileListWriter(sf, valuecoder=encode_storedfields)
+        self.storedfields = FileListWriter(
+            sf, valuecoder=misc.storedfields_encoder(ix.schema.stored_field_names())
+        )
 
         # Field length file
         self.fieldlengths = storage.create_file(segment.fieldlengths_filename)
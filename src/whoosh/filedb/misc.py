@@ -18,30 +18,45 @@ from marshal import dumps as mdumps
 from marshal import loads as mloads
 from pickle import dumps, loads
 from struct import Struct
+from sys import intern
 
 from whoosh.system import (
     _SHORT_SIZE,
     pack_uint,
     pack_ushort,
     unpack_uint,
-    unpack_ushort,
 )
-from whoosh.util import utf8decode, utf8encode
+from whoosh.util.text import utf8decode, utf8encode
 
 
+# Term keys hold the full text rather than a fingerprint of it: the term
+# index is read in key order by lexicon(), expand_prefix() and iter_from(),
+# which a hash can't give, and hashing a lookup key in memory is cheap anyway
+# because strings cache their hash
 def encode_termkey(term):
     fieldnum, text = term
     return pack_ushort(fieldnum) + utf8encode(text)[0]
 
 
+_unpack_fieldnum = Struct("!H").unpack_from
+
+
 def decode_termkey(key):
-    return (unpack_ushort(key[:_SHORT_SIZE])[0], utf8decode(key[_SHORT_SIZE:])[0])
+    # Intern the text so the same term decoded from different segments (or
+    # repeatedly during lexicon scans) shares one string object. The field
+    # number is unpacked in place instead of from a sliced copy of the key
+    return (
+        _unpack_fieldnum(key)[0],
+        intern(utf8decode(key[_SHORT_SIZE:])[0]),
+    )
 
 
 _terminfo_struct = Struct("!III")  # frequency, offset, postcount
 _pack_terminfo = _terminfo_struct.pack
 encode_terminfo = lambda cf_offset_df: _pack_terminfo(*cf_offset_df)
-decode_terminfo = _terminfo_struct.unpack
+# Takes an optional offset, so a reader can decode the info straight out of a
+# larger buffer (such as a memory map) without slicing out a copy first
+decode_terminfo = _terminfo_struct.unpack_from
 
 encode_docnum = pack_uint
 decode_docnum = lambda x: unpack_uint(x)[0]
@@ -51,3 +66,46 @@ depickle = loads
 
 enmarshal = mdumps
 demarshal = mloads
+
+
+def _dict_maker(names):
+    # Returns a function that turns a sequence of values into a dictionary
+    # keyed by the given names, in order. The function is generated with the
+    # names written into a dictionary display, which builds the dictionary
+    # about twice as fast as dict(zip(names, values)) does
+    items = ", ".join(f"{name!r}: values[{i}]" for i, name in enumerate(names))
+    namespace = {}
+    exec(f"def make_dict(values):\n    return {{{items}}}\n", namespace)
+    return namespace["make_dict"]
+
+
+def storedfields_encoder(names):
+    # Returns a function that encodes a document's stored fields. The
+    # dictionary itself is stored, so the reader gets a dict straight out of
+    # marshal.loads() instead of rebuilding one for every document
+    def encode_storedfields(fielddict):
+        return mdumps({k: fielddict.get(k) for k in names})
+
+    return encode_storedfields
+
+
+def storedfields_decoder(names):
+    # Returns a function that decodes the stored fields written by the
+    # function from storedfields_encoder(), or by older versions
+    make_dict = _dict_maker(names)
+    fieldcount = len(names)
+
+    def decode_storedfields(value):
+        # marshal.loads() takes any bytes-like object, so the list reader can
+        # pass a memoryview slice of the file instead of a copy
+        fields = mloads(value)
+        if type(fields) is not dict:
+            # Segments written before stored fields were saved as dicts have
+            # a list of values in stored field order
+            if len(fields) == fieldcount:
+                fields = make_dict(fields)
+            else:
+                fields = dict(zip(names, fields))
+        return fields
+
+    return decode_storedfields
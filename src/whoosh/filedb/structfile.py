@@ -27,7 +27,6 @@
 
 from array import array
 from copy import copy
-from io import BytesIO
 from pickle import dump, load
 from struct import calcsize
 
@@ -106,6 +105,15 @@ class StructFile:
     def read(self, *args, **kwargs):
         return self.file.read(*args, **kwargs)
 
+    def readinto(self, b):
+        """Reads bytes from the wrapped file into the given writable buffer
+        (such as a ``bytearray``, a slice of a memoryview or an ``array``),
+        instead of into a new ``bytes`` object, and returns the number of
+        bytes read. This lets a caller reuse one buffer for many reads.
+        """
+
+        return self.file.readinto(b)
+
     def readline(self, *args, **kwargs):
         return self.file.readline(*args, **kwargs)
 
@@ -358,11 +366,106 @@ class StructFile:
         return self.read_array(typecode, length)
 
 
+class MemoryviewReader:
+    """A read-only file-like object over a buffer (such as ``bytes``, an
+    ``mmap``, or a memoryview). Unlike ``BytesIO``, which copies the whole
+    buffer when it's created, this reads straight from a memoryview of the
+    buffer, so only the bytes actually read are copied.
+    """
+
+    __slots__ = ("_mv", "_pos", "size", "closed")
+
+    def __init__(self, buf):
+        # Always take a new view, so closing this reader can release it
+        # without affecting views the caller holds
+        mv = memoryview(buf)
+        if mv.format != "B":
+            mv = mv.cast("B")
+        self._mv = mv
+        self._pos = 0
+        self.size = len(mv)
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        pos = self._pos
+        if size is None or size < 0:
+            end = self.size
+        else:
+            end = min(pos + size, self.size)
+        if end <= pos:
+            return b""
+        self._pos = end
+        return bytes(self._mv[pos:end])
+
+    def readinto(self, b):
+        # Cast to bytes so any writable buffer works (such as an array, whose
+        # len() counts items rather than bytes)
+        with memoryview(b) as view, view.cast("B") as target:
+            pos = self._pos
+            n = max(0, min(target.nbytes, self.size - pos))
+            target[:n] = self._mv[pos : pos + n]
+        self._pos = pos + n
+        return n
+
+    def readline(self, size=-1):
+        mv = self._mv
+        pos = self._pos
+        end = self.size
+        if size is not None and size >= 0:
+            end = min(pos + size, end)
+        # Look for the newline a chunk at a time, instead of copying the
+        # whole rest of the buffer to search it
+        start = pos
+        while start < end:
+            stop = min(start + 4096, end)
+            i = bytes(mv[start:stop]).find(b"\n")
+            if i >= 0:
+                end = start + i + 1
+                break
+            start = stop
+        return self.read(end - pos)
+
+    def seek(self, pos, whence=0):
+        if whence == 1:
+            pos += self._pos
+        elif whence == 2:
+            pos += self.size
+        elif whence != 0:
+            raise ValueError(f"Invalid whence ({whence!r})")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self._pos = pos
+        return pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._mv.release()
+            self.closed = True
+
+
 class BufferFile(StructFile):
     def __init__(self, buf, name=None, onclose=None):
         self._buf = buf
         self._name = name
-        self.file = BytesIO(buf)
+        self.file = MemoryviewReader(buf)
         self.onclose = onclose
 
         self.is_real = False
@@ -370,7 +473,9 @@ class BufferFile(StructFile):
 
     def subset(self, position, length, name=None):
         name = name or self._name
-        return BufferFile(self.get(position, length), name=name)
+        # Share the buffer instead of copying the range out of it
+        view = memoryview(self._buf)[position : position + length]
+        return BufferFile(view, name=name)
 
     def get(self, position, length):
         return bytes(self._buf[position : position + length])
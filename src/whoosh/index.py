@@ -379,10 +379,13 @@ def clean_files(storage, indexname, gen, segments):
     current_segment_names = {s.segment_id() for s in segments}
     tocpattern = TOC._pattern(indexname)
     segpattern = TOC._segment_pattern(indexname)
+    # TOC files start with "_<indexname>_" and segment files with
+    # "<indexname>_", so anything else can be skipped without a regex match
+    prefixes = (f"_{indexname}_", f"{indexname}_")
 
     todelete = set()
     for filename in storage:
-        if filename.startswith("."):
+        if not filename.startswith(prefixes):
             continue
         tocm = tocpattern.match(filename)
         segm = segpattern.match(filename)
@@ -598,18 +601,21 @@ class TOC:
 
     @classmethod
     def _pattern(cls, indexname):
-        return re.compile(f"^_{indexname}_([0-9]+).toc$")
+        return re.compile(f"^_{indexname}_([0-9]+).toc$", re.ASCII)
 
     @classmethod
     def _segment_pattern(cls, indexname):
-        return re.compile(f"({indexname}_[0-9a-z]+)[.][A-Za-z0-9_.]+")
+        return re.compile(f"({indexname}_[0-9a-z]+)[.][A-Za-z0-9_.]+", re.ASCII)
 
     @classmethod
     def _latest_generation(cls, storage, indexname):
         pattern = cls._pattern(indexname)
+        prefix = f"_{indexname}_"
 
         mx = -1
         for filename in storage:
+            if not filename.startswith(prefix):
+                continue
             m = pattern.match(filename)
             if m:
                 mx = max(int(m.group(1)), mx)
@@ -631,6 +637,13 @@ class TOC:
 
     @classmethod
     def read(cls, storage, indexname, gen=None, schema=None):
+        # Opening the segments looks up several files each, so let the
+        # storage read what it knows about the files in one go first. Older
+        # storage implementations may not have the method
+        prefetch = getattr(storage, "prefetch_metadata", None)
+        if prefetch is not None:
+            prefetch()
+
         if gen is None:
             gen = cls._latest_generation(storage, indexname)
             if gen < 0:
@@ -677,7 +690,10 @@ class TOC:
 
             # Generation
             index_gen = stream.read_int()
-            assert gen == index_gen
+            if index_gen != gen:
+                raise IndexError(
+                    f"TOC file {tocfilename!r} contains generation {index_gen}"
+                )
 
             _ = stream.read_int()  # Unused
             segments = stream.read_pickle()
@@ -603,3 +603,8 @@ def length_to_byte(length):
 
 
 byte_to_length = _length_byte_cache.__getitem__
+
+# The decoded length for every possible length byte, as a tuple, for code that
+# decodes many lengths at once: indexing the tuple doesn't make a new int the
+# way indexing the array does
+_BYTE_LENGTHS = tuple(_length_byte_cache)
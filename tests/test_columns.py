@@ -1,6 +1,7 @@
 import inspect
 import random
 import sys
+from array import array
 from io import BytesIO
 from pickle import dumps, loads
 
@@ -104,6 +105,22 @@ def test_random_multistream():
         msr.close()
 
 
+def test_multistream_buffers():
+    st = RamStorage()
+    msw = compound.CompoundWriter(st, buffersize=16)
+    f = msw.create_file("a")
+    f.write(bytearray(b"alfa"))
+    f.write(memoryview(b"bravo"))
+    f.write(memoryview(array("I", [1, 2, 3, 4])))
+    f.write(b"charlie")
+    f = st.create_file("test")
+    msw.save_as_compound(f)
+
+    msr = compound.CompoundStorage(st.open_file("test"))
+    expected = b"alfabravo" + array("I", [1, 2, 3, 4]).tobytes() + b"charlie"
+    assert msr.open_file("a").read() == expected
+
+
 def _rt(c, values, default):
     # Continuous
     st = RamStorage()
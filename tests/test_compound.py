@@ -22,6 +22,7 @@ def _test_simple_compound(st):
     CompoundStorage.assemble(f, st, ["a", "b", "c"])
 
     f = CompoundStorage(st.open_file("f"))
+    assert sorted(f) == ["a", "b", "c"]
     with f.open_file("a") as af:
         for x in alist:
             assert x == af.read_int()
@@ -44,6 +45,20 @@ def test_simple_compound_mmap():
         _test_simple_compound(st)
 
 
+def test_compound_close_with_open_files():
+    with TempStorage("compoundclose") as st:
+        with st.create_file("a") as af:
+            af.write(b"alfa")
+        CompoundStorage.assemble(st.create_file("f"), st, ["a"])
+
+        cst = CompoundStorage(st.open_file("f"))
+        af = cst.open_file("a")
+        cst.close()
+        # The file's slice of the map outlives the storage
+        assert af.read() == b"alfa"
+        af.close()
+
+
 def test_simple_compound_nomap():
     st = RamStorage()
     _test_simple_compound(st)
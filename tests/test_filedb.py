@@ -0,0 +1,184 @@
+from marshal import dumps, loads
+
+import pytest
+
+from whoosh import analysis, fields
+from whoosh.filedb import misc
+from whoosh.filedb.filepostings import (
+    _DELTA_IDS,
+    _UINT,
+    BlockInfo,
+    FilePostingReader,
+    FilePostingWriter,
+)
+from whoosh.filedb.filestore import RamStorage
+from whoosh.formats import Existence, Frequency, Positions
+from whoosh.util.numeric import byte_to_length, length_to_byte
+
+
+def _open(st, name, mapped):
+    f = st.open_file(name)
+    if mapped:
+        # The segment reader attaches a memory map of the file like this
+        f.map = st.open_buffer(name)
+    return f
+
+
+def _read_postings(r):
+    postings = []
+    while r.is_active():
+        postings.append((r.id(), r.weight(), r.value()))
+        r.next()
+    return postings
+
+
+@pytest.mark.parametrize("mapped", [False, True])
+def test_blockinfo(mapped):
+    assert BlockInfo._struct.format == "!IiifffB"
+
+    st = RamStorage()
+    bi = BlockInfo(100, 5, 2.5, 0.5, 3, 42, flags=_DELTA_IDS)
+    bi2 = BlockInfo(200, 1, 1.0, 0.25, 7, "alfa")
+    with st.create_file("b") as f:
+        bi.to_file(f)
+        bi2.to_file(f)
+
+    data = bytes(st.open_buffer("b"))
+    size = BlockInfo._struct.size
+    assert BlockInfo._struct.unpack_from(data) == (
+        100,
+        _DELTA_IDS,
+        5,
+        2.5,
+        0.5,
+        0.0,
+        length_to_byte(3),
+    )
+    assert _UINT.unpack_from(data, size)[0] == 42
+
+    f = _open(st, "b", mapped)
+    info = BlockInfo.from_file(f, 0)
+    assert info.nextoffset == 100
+    assert info.flags == _DELTA_IDS
+    assert info.postcount == 5
+    assert (info.maxweight, info.maxwol) == (2.5, 0.5)
+    assert info.minlength == byte_to_length(length_to_byte(3))
+    assert info.maxid == 42
+    assert info.dataoffset == size + _UINT.size
+
+    info = BlockInfo.from_file(f, size + _UINT.size, stringids=True)
+    assert (info.nextoffset, info.flags, info.postcount) == (200, 0, 1)
+    assert info.maxid == "alfa"
+    assert info.dataoffset == len(data)
+    f.close()
+
+
+@pytest.mark.parametrize("mapped", [False, True])
+@pytest.mark.parametrize("format_", [Existence(), Frequency(), Positions()])
+def test_postings_roundtrip(format_, mapped):
+    field = fields.FieldType(format_, analysis.StandardAnalyzer(), scorable=True)
+    schema = {0: field}
+    lengths = {}
+    lists = {
+        # Three blocks, one block, and no postings at all
+        "long": [(docnum * 7 + 3, (docnum % 4) + 1) for docnum in range(10)],
+        "short": [(5, 2), (700, 1), (70000, 3)],
+        "empty": [],
+    }
+
+    st = RamStorage()
+    offsets = {}
+    pf = st.create_file("p")
+    w = FilePostingWriter(schema, pf, blocklimit=4)
+    w.dfl_fn = lambda docnum, fieldnum: lengths[docnum]
+    for name, postings in lists.items():
+        offsets[name] = w.start(0)
+        for docnum, freq in postings:
+            lengths[docnum] = freq + 1
+            ((_, _, _, valuestring),) = field.index(" ".join(["alfa"] * freq))
+            w.write(docnum, valuestring)
+        assert w.finish() == len(postings)
+    w.close()
+
+    data = bytes(st.open_buffer("p"))
+    # The number of blocks comes before the first block
+    assert _UINT.unpack_from(data, offsets["long"])[0] == 3
+    assert _UINT.unpack_from(data, offsets["short"])[0] == 1
+    assert _UINT.unpack_from(data, offsets["empty"])[0] == 0
+    # Integer IDs are stored as deltas
+    first = BlockInfo.from_file(_open(st, "p", False), offsets["long"] + _UINT.size)
+    assert first.flags & _DELTA_IDS
+    assert first.postcount == 4
+    assert first.maxid == lists["long"][3][0]
+
+    f = _open(st, "p", mapped)
+    for name, postings in lists.items():
+        r = FilePostingReader(f, offsets[name], format_)
+        docnums = [docnum for docnum, _ in postings]
+        assert list(r.all_ids()) == docnums
+        got = _read_postings(r)
+        assert [docnum for docnum, _, _ in got] == docnums
+        if format_.posting_size:
+            for (_, freq), (_, weight, value) in zip(postings, got):
+                assert weight == freq
+                assert format_.decode_frequency(value) == freq
+        else:
+            assert all(value is None for _, _, value in got)
+
+        if postings:
+            r = FilePostingReader(f, offsets[name], format_)
+            target = docnums[-1]
+            r.skip_to(target)
+            assert r.id() == target
+            r.next()
+            assert not r.is_active()
+    f.close()
+
+
+@pytest.mark.parametrize("mapped", [False, True])
+def test_string_id_postings(mapped):
+    format_ = Frequency()
+    schema = {0: fields.FieldType(format_, analysis.StandardAnalyzer())}
+    words = ["alfa", "bravo", "charlie", "delta", "echo", "foxtrot", "été"]
+
+    st = RamStorage()
+    pf = st.create_file("v")
+    w = FilePostingWriter(schema, pf, stringids=True, blocklimit=3)
+    offset = w.start(0)
+    for i, word in enumerate(words):
+        w.write(word, _UINT.pack(i + 1))
+    assert w.finish() == len(words)
+    w.close()
+
+    f = _open(st, "v", mapped)
+    first = BlockInfo.from_file(f, offset + _UINT.size, stringids=True)
+    assert not first.flags & _DELTA_IDS
+    assert first.maxid == "charlie"
+
+    r = FilePostingReader(f, offset, format_, stringids=True)
+    assert list(r.all_ids()) == words
+    got = _read_postings(r)
+    assert [(word, weight) for word, weight, _ in got] == [
+        (word, i + 1) for i, word in enumerate(words)
+    ]
+    f.close()
+
+
+def test_storedfields_roundtrip():
+    names = ["title", "path", "count"]
+    encode = misc.storedfields_encoder(names)
+    decode = misc.storedfields_decoder(names)
+
+    value = encode({"title": "alfa", "count": 3, "unstored": "bravo"})
+    # The document is saved as a dictionary of the stored fields
+    assert loads(value) == {"title": "alfa", "path": None, "count": 3}
+    assert decode(value) == {"title": "alfa", "path": None, "count": 3}
+    assert decode(memoryview(value)) == decode(value)
+
+    # Segments from before the change have a list of values
+    assert decode(dumps(["alfa", "/a", 3])) == {
+        "title": "alfa",
+        "path": "/a",
+        "count": 3,
+    }
+    assert decode(dumps(["alfa", "/a"])) == {"title": "alfa", "path": "/a"}
@@ -0,0 +1,387 @@
+import errno
+import os
+import pickle
+from array import array
+from struct import unpack_from
+
+import pytest
+
+from whoosh import fields
+from whoosh.filedb.compound import CompoundStorage
+from whoosh.filedb.filestore import (
+    FileStorage,
+    OverlayStorage,
+    RamStorage,
+    copy_storage,
+    copy_to_ram,
+    memoryview_,
+)
+from whoosh.index import TOC
+from whoosh.util.testing import TempStorage
+
+
+@pytest.fixture
+def filestore(request):
+    with TempStorage(request.function.__name__) as st:
+        yield st
+
+
+@pytest.fixture(params=["file", "ram"])
+def storage(request):
+    if request.param == "ram":
+        yield RamStorage()
+    else:
+        with TempStorage(request.function.__name__) as st:
+            yield st
+
+
+def _write(st, name, data):
+    with st.create_file(name) as f:
+        f.write(data)
+
+
+def test_ramstorage_buffer_file():
+    st = RamStorage()
+    with st.create_file("f") as f:
+        f.write(b"alfa\nbravo\n")
+        f.write_int(12345)
+        f.write_pickle({"a": [1, 2]})
+
+    f = st.open_file("f")
+    assert f.readline() == b"alfa\n"
+    assert f.read(3) == b"bra"
+    assert f.readline() == b"vo\n"
+    assert f.read_int() == 12345
+    assert f.read_pickle() == {"a": [1, 2]}
+    assert f.read() == b""
+    f.seek(0)
+    assert list(f)[:2] == [b"alfa\n", b"bravo\n"]
+    f.seek(-4, 2)
+    buf = bytearray(10)
+    assert f.file.readinto(buf) == 4
+    assert f.get(5, 5) == b"bravo"
+
+    # Reading into part of a reused buffer, and into an array
+    f.seek(0)
+    view = memoryview(buf)
+    assert f.readinto(view[:4]) == 4
+    assert buf[:4] == b"alfa"
+    f.seek(5)
+    arr = array("H", [0, 0])
+    assert f.readinto(arr) == 4
+    assert arr.tobytes() == b"brav"
+
+    sub = f.subset(5, 5)
+    assert sub.read() == b"bravo"
+    assert sub.get(1, 3) == b"rav"
+    sub.close()
+    f.close()
+    assert pickle.loads(st.files["f"][15:]) == {"a": [1, 2]}
+
+
+def test_memoryview_slices():
+    data = b"alfa bravo"
+    assert memoryview_(data) == data
+    assert memoryview_(data, 0, 4) == b"alfa"
+    assert memoryview_(data, 0, 0) == b""
+    assert memoryview_(data, 5) == b"bravo"
+    assert memoryview_(data, length=2) == b"al"
+    mv = memoryview(data)
+    assert memoryview_(mv) is mv
+    assert memoryview_(mv, 5, 3) == b"bra"
+
+
+def test_overlay_storage():
+    a = RamStorage()
+    _write(a, "x", b"alfa")
+    b = RamStorage()
+    _write(b, "x", b"bravo")
+
+    st = OverlayStorage(a, b)
+    assert not hasattr(st, "__dict__")
+    _write(st, "y", b"charlie")
+    assert sorted(st.list()) == ["x", "y"]
+    assert list(st) == ["x", "y"]
+    assert st.file_exists("x") and st.file_exists("y")
+    assert not st.file_exists("z")
+    assert st.open_file("x").read() == b"alfa"
+    assert st.open_file("y").read() == b"charlie"
+    assert st.file_length("y") == 7
+    st.delete_file("y")
+    assert st.list() == ["x"]
+
+    # Files only added to the RamStorage when they're closed are listed
+    f = st.create_file("w")
+    assert st.list() == ["x"]
+    f.close()
+    assert st.list() == ["w", "x"]
+
+    # A file removed from the first storage falls through to the second
+    st.delete_file("w")
+    a.delete_file("x")
+    assert st.open_file("x").read() == b"bravo"
+    assert st.file_length("x") == 5
+    assert st.file_modified("x") == -1
+
+    # Changes made to the first storage directly are seen straight away
+    _write(a, "v", b"victor")
+    assert st.file_exists("v")
+    assert st.open_file("v").read() == b"victor"
+    assert st.file_length("v") == 6
+    a.delete_file("v")
+    assert not st.file_exists("v")
+    st.prefetch_metadata()
+    assert "v" not in st.list()
+
+
+def test_overlay_prefetch_duck_storage():
+    class DuckStorage:
+        # A storage without prefetch_metadata()
+        def list(self):
+            return ["x"]
+
+    b = RamStorage()
+    st = OverlayStorage(DuckStorage(), b)
+    assert st.list() == ["x"]
+    _write(b, "y", b"yankee")
+    st.prefetch_metadata()
+    assert st.list() == ["x", "y"]
+
+
+def test_overlay_index():
+    schema = fields.Schema(text=fields.TEXT)
+    a = RamStorage()
+    ix = a.create_index(schema)
+    with ix.writer() as w:
+        w.add_document(text="alfa")
+
+    st = OverlayStorage(a, RamStorage())
+    assert st.open_index().doc_count() == 1
+    assert st.create_index(schema).doc_count() == 0
+
+
+def test_toc_read_duck_storage():
+    class DuckStorage:
+        # A storage that doesn't subclass Storage or have every method
+        def __init__(self, st):
+            self._st = st
+
+        def __iter__(self):
+            return iter(self._st)
+
+        def open_file(self, name, **kwargs):
+            return self._st.open_file(name, **kwargs)
+
+    st = RamStorage()
+    st.create_index(fields.Schema(text=fields.TEXT))
+    toc = TOC.read(DuckStorage(st), "MAIN")
+    assert toc.generation == 0
+
+
+def test_open_files(storage):
+    for name in ("a", "b", "c"):
+        _write(storage, name, name.encode("ascii") * 3)
+
+    files = storage.open_files(["c", "a"])
+    assert [f.read() for f in files] == [b"ccc", b"aaa"]
+    for f in files:
+        f.close()
+
+
+def test_file_stats(storage):
+    _write(storage, "a", b"x" * 3)
+    _write(storage, "b", b"x" * 10)
+
+    stats = storage.file_stats()
+    assert sorted(stats) == ["a", "b"]
+    for name in ("a", "b"):
+        assert stats[name] == (storage.file_length(name), storage.file_modified(name))
+    assert storage.file_stats(["b"]) == {"b": stats["b"]}
+
+
+def test_open_buffer(storage):
+    with storage.create_file("a") as f:
+        f.write(b"alfa")
+        f.write_int(42)
+    storage.create_file("empty").close()
+
+    buf = storage.open_buffer("a")
+    assert buf.readonly
+    assert buf[:4] == b"alfa"
+    assert unpack_from("!i", buf, 4) == (42,)
+    buf.release()
+    assert storage.open_buffer("empty") == b""
+
+    CompoundStorage.assemble(storage.create_file("c"), storage, ["a", "empty"])
+    cst = CompoundStorage(storage.open_file("c"))
+    buf = cst.open_buffer("a")
+    assert buf.readonly and buf == b"alfa\x00\x00\x00*"
+    buf.release()
+    cst.close()
+
+
+def test_open_file_hint(storage):
+    _write(storage, "a", b"alfa")
+    for hint in (None, "sequential", "random", "willneed"):
+        with storage.open_file("a", hint=hint) as f:
+            assert f.read() == b"alfa"
+
+
+def test_unknown_hint(filestore):
+    _write(filestore, "a", b"alfa")
+    with pytest.raises(ValueError):
+        filestore.open_file("a", hint="backwards")
+
+
+def test_rejected_advice(filestore, monkeypatch):
+    def posix_fadvise(fd, offset, length, advice):
+        raise OSError(errno.ESPIPE, "Illegal seek")
+
+    monkeypatch.setattr(os, "posix_fadvise", posix_fadvise, raising=False)
+    monkeypatch.setattr(os, "POSIX_FADV_WILLNEED", 3, raising=False)
+    _write(filestore, "a", b"alfa")
+    with filestore.open_file("a", hint="sequential") as f:
+        assert f.read() == b"alfa"
+    for f in filestore.open_files(["a"]):
+        assert f.read() == b"alfa"
+        f.close()
+
+
+def test_filestorage_iter(filestore):
+    for name in ("a", "b", "c"):
+        filestore.create_file(name).close()
+    assert sorted(filestore) == ["a", "b", "c"]
+
+    # Deleting files while iterating is safe
+    for name in filestore:
+        filestore.delete_file(name)
+    assert filestore.list() == []
+
+    assert list(FileStorage("/nonexistent/whoosh")) == []
+
+
+def test_rename_file(filestore):
+    _write(filestore, "a", b"a")
+    _write(filestore, "b", b"b")
+
+    with pytest.raises(NameError):
+        filestore.rename_file("a", "b", safe=True)
+    filestore.rename_file("a", "b")
+    assert filestore.list() == ["b"]
+    with filestore.open_file("b") as f:
+        assert f.read() == b"a"
+    filestore.rename_file("b", "c", safe=True)
+    assert filestore.list() == ["c"]
+
+
+def test_index_exists_cache(filestore):
+    assert not filestore.index_exists()
+    ix = filestore.create_index(fields.Schema(text=fields.TEXT))
+    ix.close()
+    assert filestore.index_exists()
+
+    # Once the directory's mtime is old enough, the answer is reused
+    os.utime(filestore.folder, (1, 1))
+    assert filestore.index_exists()
+    assert filestore._exists_cache[ix.indexname][1] is True
+
+    # Removing the files changes the mtime, so the index is checked again
+    filestore.clean()
+    assert not filestore.index_exists()
+
+
+def test_open_files_mmap(filestore):
+    with filestore.create_file("a") as f:
+        f.write(b"alfa")
+        f.write_int(42)
+    filestore.create_file("empty").close()
+
+    a, empty = filestore.open_files_mmap(["a", "empty"])
+    assert a.read(4) == b"alfa"
+    assert a.read_int() == 42
+    assert a.get(1, 3) == b"lfa"
+    assert empty.read() == b""
+    sub = a.subset(0, 2)
+    a.close()
+    assert sub.read() == b"al"
+    sub.close()
+    empty.close()
+
+
+def test_ram_temp_storage():
+    st = RamStorage()
+    t1 = st.temp_storage()
+    t2 = st.temp_storage()
+    assert t1.folder != t2.folder
+    assert os.path.dirname(t1.folder) == os.path.dirname(t2.folder)
+    _write(t1, "a", b"alfa")
+    assert t1.list() == ["a"]
+    assert t2.list() == []
+
+    t3 = st.temp_storage("named")
+    assert os.path.basename(t3.folder) == "named"
+    assert os.path.isdir(t3.folder)
+    for t in (t1, t2, t3):
+        t.destroy()
+        assert not os.path.exists(t.folder)
+
+
+def test_cached_stats(filestore):
+    st = FileStorage(filestore.folder, cache_stats=True)
+    assert st.list() == []
+    assert not st.file_exists("a")
+    _write(st, "a", b"alfa")
+    assert st.list() == ["a"]
+    assert st.file_exists("a")
+    assert st.file_length("a") == 4
+
+    _write(st, "a", b"alfabravo")
+    assert st.file_length("a") == 9
+    assert st.file_stats(["a"])["a"][0] == 9
+
+    st.rename_file("a", "b")
+    assert not st.file_exists("a")
+    assert st.file_length("b") == 9
+    assert st.list() == ["b"]
+    with pytest.raises(FileNotFoundError):
+        st.file_modified("a")
+
+    # Changes made through another object aren't seen until the cache is
+    # cleared
+    filestore.delete_file("b")
+    assert st.file_exists("b")
+    st.clear_stat_cache()
+    assert not st.file_exists("b")
+    assert st.list() == []
+
+    # Reading the directory fills the cache
+    assert not st.file_exists("c")
+    _write(filestore, "c", b"charlie")
+    assert not st.file_exists("c")
+    st.prefetch_metadata()
+    assert list(st) == ["c"]
+    assert st._stat_cache["c"].st_size == 7
+    assert st.file_length("c") == 7
+
+
+def test_file_paths():
+    st = FileStorage("indexdir")
+    folder = os.path.abspath("indexdir")
+    assert st._fpath("_MAIN_1.toc") == os.path.join(folder, "_MAIN_1.toc")
+    assert st._fpath(os.path.join("sub", "a")) == os.path.join(folder, "sub", "a")
+    assert st._fpath("..") == os.path.dirname(folder)
+    assert st._fpath(".") == folder
+
+
+def test_copy_storage():
+    with TempStorage("copysource") as src, TempStorage("copydest") as dest:
+        _write(src, "a", b"alfa")
+        src.create_file("empty").close()
+
+        copy_storage(src, dest)
+        assert sorted(dest.list()) == ["a", "empty"]
+        assert dest.open_file("a").read() == b"alfa"
+        assert dest.file_length("empty") == 0
+
+        ram = copy_to_ram(dest)
+        assert ram.open_file("a").read() == b"alfa"